@@ -0,0 +1,204 @@
+import re
+import unicodedata
+from collections import namedtuple
+
+# Abreviações comuns nos endereços das autuações, expandidas antes da comparação
+ABBREVIATIONS = {
+    "av": "avenida",
+    "avda": "avenida",
+    "r": "rua",
+    "rod": "rodovia",
+    "estr": "estrada",
+    "est": "estrada",
+    "al": "alameda",
+    "pca": "praca",
+    "pc": "praca",
+    "tv": "travessa",
+    "trav": "travessa",
+    "lgo": "largo",
+    "pq": "parque",
+    "vd": "viaduto",
+    "ver": "vereador",
+    "sen": "senador",
+    "pres": "presidente",
+    "gov": "governador",
+    "dr": "doutor",
+    "prof": "professor",
+    "mal": "marechal",
+    "gal": "general",
+    "gen": "general",
+    "cel": "coronel",
+    "eng": "engenheiro",
+    "sta": "santa",
+    "sto": "santo",
+}
+
+# Palavras que não identificam o logradouro (preposições, sentido da pista, rótulos)
+STOPWORDS = {
+    "a", "o", "e", "de", "da", "do", "das", "dos", "em", "no", "na", "n", "num", "numero",
+    "altura", "prox", "proximo", "sentido", "pista", "norte", "sul", "leste", "oeste", "d",
+    "uf", "bairro", "km", "m", "metros",
+}
+
+# Tipos de logradouro (já expandidos); um numeral logo após o tipo é o nome ("RUA 1")
+STREET_TYPES = {
+    "rua", "avenida", "rodovia", "estrada", "alameda", "praca", "travessa", "largo", "parque", "viaduto",
+    "ladeira", "beco",
+}
+
+# Rodovias federais e estaduais ("BR 101", "BR-101", "SPD 128")
+HIGHWAY_PATTERN = re.compile(r"\b(br|rj|sp|mg|es|spa|spd|spi|spm)\s*-?\s*(\d{2,3})\b")
+HIGHWAY_TOKEN = re.compile(r"^(br|rj|sp|mg|es|spa|spd|spi|spm)\d{2,3}$")
+# "KM 233.00", "KM-383", "km 12+500", "KM 000 METROS 200"
+KM_AFTER_PATTERN = re.compile(r"\bkm\s*-?\s*(\d+)(?:([.,])(\d+)|\s*(?:\+|metros?\s+)(\d+))?")
+# "414KM 900M"
+KM_BEFORE_PATTERN = re.compile(r"\b(\d+)\s*km\b(?:\s*(\d+)\s*m\b)?")
+# Numerais que fazem parte do nome do logradouro: "RUA 7 DE SETEMBRO", "AV. 13 DE MAIO"
+NAMED_NUMBER_PATTERN = re.compile(r"\b(\d+)\s+de\b(?=\s+[a-z])")
+# Município após o último hífen: "... -ITAGUAI", "NUMERO 22-SAO PAULO"
+CITY_PATTERN = re.compile(r"-\s*([a-z][a-z ]*)$")
+# UF ao final do município: "RIO DE JANEIRO/RJ", "NITEROI - RJ", "PIRAI, RJ"
+STATE_SUFFIX_PATTERN = re.compile(r"\s*[-/,]\s*(ac|al|am|ap|ba|ce|df|es|go|ma|mg|ms|mt|pa|pb|pe|pi|pr|rj|rn|ro|rr|rs|sc|se|sp|to)$")
+
+# Grafias alternativas de municípios (já sem acentos e stopwords)
+CITY_ALIASES = {
+    "rio": "rio janeiro",
+    "dq caxias": "duque caxias",
+    "campos": "campos goytacazes",
+    "s paulo": "sao paulo",
+}
+
+Address = namedtuple("Address", ["street", "number", "km", "city"])
+
+
+def strip_accents(text):
+    """Remove acentos e converte símbolos compatíveis ("nº" vira "no"), em minúsculas."""
+    return ''.join(
+        c for c in unicodedata.normalize('NFKD', text)
+        if unicodedata.category(c) != 'Mn'
+    ).lower().strip()
+
+
+def _extract_km(text):
+    """Retorna (texto sem o marco quilométrico, km em float ou None)."""
+    match = KM_AFTER_PATTERN.search(text)
+    if match:
+        km, _, decimals, meters = match.groups()
+        if decimals:
+            value = float(f"{km}.{decimals}")
+        else:
+            value = int(km) + int(meters or 0) / 1000
+        return text[:match.start()] + " " + text[match.end():], value
+
+    match = KM_BEFORE_PATTERN.search(text)
+    if match:
+        km, meters = match.groups()
+        return text[:match.start()] + " " + text[match.end():], int(km) + int(meters or 0) / 1000
+    return text, None
+
+
+def tokenize(text, keep_stopwords=False):
+    """
+    Quebra um texto em tokens normalizados: sem acentos, minúsculos, com
+    abreviações expandidas, códigos de rodovia unidos ("br 101" vira "br101")
+    e sem stopwords (a menos que keep_stopwords seja True).
+    """
+    text = HIGHWAY_PATTERN.sub(r" \1\2 ", strip_accents(text))
+    tokens = []
+    for token in re.findall(r"\b(?:br|rj|sp|mg|es|spa|spd|spi|spm)\d{2,3}\b|[a-z]+|\d+", text):
+        token = ABBREVIATIONS.get(token, token)
+        if keep_stopwords or token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def _street_positions(tokens):
+    """
+    Posições dos tokens (com stopwords) que formam o nome do logradouro.
+
+    Além das palavras que não são stopwords, mantém o numeral logo após o tipo
+    ("RUA 1 100") e, quando o nome seria só o tipo, a palavra seguinte ("RUA A",
+    "AVENIDA NORTE"), para que logradouros diferentes não tenham a mesma chave.
+    """
+    positions = {
+        position for position, token in enumerate(tokens)
+        if not token.isdigit() and token not in STOPWORDS
+    }
+    following = [
+        position + 1 for position, token in enumerate(tokens[:-1])
+        if token in STREET_TYPES and tokens[position + 1] not in STREET_TYPES
+    ]
+    positions.update(position for position in following if tokens[position].isdigit())
+    if following and all(tokens[position] in STREET_TYPES for position in positions):
+        positions.add(following[0])
+    return positions
+
+
+def parse_address(text):
+    """
+    Separa um endereço de autuação em logradouro, número, km e município.
+
+    Parâmetros:
+        text (str): Endereço como aparece em "Local da Infração".
+
+    Retorna:
+        Address: street (tupla de tokens; só os códigos de rodovia quando
+        houver), number (o último numeral fora do nome, int ou None), km
+        (float ou None) e city (str ou None).
+    """
+    text = STATE_SUFFIX_PATTERN.sub("", strip_accents(text))
+
+    city = None
+    match = CITY_PATTERN.search(text)
+    if match:
+        city = " ".join(tokenize(match.group(1))) or None
+        city = CITY_ALIASES.get(city, city)
+        text = text[:match.start()]
+
+    text = re.sub(r"\([^)]*\)", " ", text)  # Bairro entre parênteses
+    text, km = _extract_km(text)
+
+    # Numerais do nome viram um único token ("7 de"), separado do número do imóvel
+    tokens, position = [], 0
+    for match in NAMED_NUMBER_PATTERN.finditer(text):
+        tokens.extend(tokenize(text[position:match.start()], keep_stopwords=True))
+        tokens.append(f"{int(match.group(1))} de")
+        position = match.end()
+    tokens.extend(tokenize(text[position:], keep_stopwords=True))
+
+    highways = tuple(token for token in tokens if HIGHWAY_TOKEN.match(token))
+    names = _street_positions(tokens)
+    words = tuple(token for position, token in enumerate(tokens) if position in names)
+    numbers = [
+        int(token) for position, token in enumerate(tokens)
+        if token.isdigit() and position not in names and int(token) > 0
+    ]
+    street = highways or words
+    return Address(street, numbers[-1] if numbers else None, km, city)
+
+
+def canonicalize(text):
+    """
+    Forma canônica de um endereço, usada como chave do cache de coordenadas.
+
+    Variações como "AV. BRASIL, 500", "AVENIDA BRASIL 500" e "Av Brasil nº500"
+    resultam na mesma chave ("avenida brasil 500"). A função é idempotente, e
+    endereços sem logradouro reconhecível ficam apenas sem acentos e em
+    minúsculas.
+
+    Parâmetros:
+        text (str): Endereço como aparece em "Local da Infração".
+
+    Retorna:
+        str: Logradouro, número, "km X" e " - município", quando presentes.
+    """
+    address = parse_address(text)
+    if not address.street:
+        return strip_accents(text)
+    parts = list(address.street)
+    if address.number is not None:
+        parts.append(str(address.number))
+    if address.km is not None:
+        parts.append(f"km {address.km:g}")
+    key = " ".join(parts)
+    return f"{key} - {address.city}" if address.city else key
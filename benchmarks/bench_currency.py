@@ -0,0 +1,72 @@
+"""
+Microbenchmark do parser de valores monetários.
+
+Compara a cadeia antiga (astype(str) + str.replace + astype(float)) com
+parsers.parse_brl_to_centavos sobre 1 milhão de strings no formato brasileiro.
+
+Uso:
+    python benchmarks/bench_currency.py [--rows 1000000] [--distinct 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parsers import parse_brl_to_centavos  # noqa: E402
+
+
+def format_brl(centavos):
+    reais, cents = divmod(int(centavos), 100)
+    return f"{reais:,}".replace(",", ".") + f",{cents:02d}"
+
+
+def make_values(rows, distinct, seed=42):
+    """Gera valores com repetição, como na planilha (poucos valores de multa distintos)."""
+    rng = np.random.default_rng(seed)
+    pool = np.array([format_brl(c) for c in rng.integers(5_000, 300_000_00, size=distinct)], dtype=object)
+    return pd.Series(pool[rng.integers(0, distinct, size=rows)], dtype=object)
+
+
+def old_chain(series):
+    return (
+        series
+        .astype(str)
+        .str.replace('.', '', regex=False)
+        .str.replace(',', '.', regex=False)
+        .astype(float)
+    )
+
+
+def timeit(func, series, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(series)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for distinct in (args.distinct, args.rows):
+        series = make_values(args.rows, distinct)
+        expected = (old_chain(series) * 100).round().astype("int64")
+        assert (parse_brl_to_centavos(series).astype("int64") == expected).all()
+
+        old = timeit(old_chain, series, args.repeat)
+        new = timeit(parse_brl_to_centavos, series, args.repeat)
+        print(f"{args.rows:>9,} linhas, {distinct:>9,} distintos | "
+              f"cadeia antiga: {old:7.3f}s | parse_brl_to_centavos: {new:7.3f}s | {old / new:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_FILE = "coordinates_cache.db"
+JSON_CACHE_FILE = "coordinates_cache.json"
+SQLITE_TIMEOUT = 30  # Segundos aguardando locks de escrita de outras sessões/processos
+SQLITE_MAX_VARIABLES = 500  # Chaves por consulta IN (...)
+FLUSH_INTERVAL = 5.0  # Segundos após o último flush a partir dos quais a próxima gravação grava as pendentes
+FLUSH_SIZE = 200  # Gravações pendentes que disparam uma escrita imediata
+CHECKPOINT_INTERVAL = 600  # Segundos entre checkpoints que incorporam o WAL ao arquivo principal
+
+
+def _migration_1(connection, json_path):
+    """Cria a tabela de coordenadas e importa o cache JSON legado, se existir."""
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS coordinates (
+            key TEXT PRIMARY KEY,
+            lat REAL NOT NULL,
+            lng REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    if not json_path or not os.path.exists(json_path):
+        return
+    try:
+        with open(json_path, 'r') as file:
+            legacy = json.load(file)
+    except (IOError, json.JSONDecodeError) as e:
+        print(f"Erro ao migrar o cache JSON: {e}")
+        return
+
+    now = time.time()
+    rows = [
+        (key, coords[0], coords[1], now)
+        for key, coords in legacy.items()
+        if isinstance(coords, (list, tuple)) and len(coords) == 2 and None not in coords
+    ]
+    connection.executemany(
+        "INSERT OR IGNORE INTO coordinates (key, lat, lng, updated_at) VALUES (?, ?, ?, ?)", rows
+    )
+    print(f"{len(rows)} coordenadas migradas de {json_path}")
+
+
+def _migration_2(connection, json_path):
+    """Cria a tabela de falhas de geocodificação (cache negativo com expiração)."""
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS failures (
+            key TEXT PRIMARY KEY,
+            reason TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS failures_expires_at ON failures (expires_at)")
+
+
+def _migration_3(connection, json_path):
+    """Cria a tabela do gazetteer (logradouros e marcos quilométricos importados)."""
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS gazetteer (
+            name TEXT NOT NULL,
+            km REAL,
+            lat REAL NOT NULL,
+            lng REAL NOT NULL,
+            source TEXT NOT NULL
+        )
+        """
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS gazetteer_source ON gazetteer (source)")
+
+
+# Migrações em ordem; a versão do esquema fica em PRAGMA user_version
+MIGRATIONS = [_migration_1, _migration_2, _migration_3]
+
+
+class CoordinateStore:
+    """
+    Cache persistente de coordenadas em SQLite (modo WAL).
+
+    Cada thread usa a própria conexão; leituras não bloqueiam escritas e as
+    escritas de várias sessões/processos são serializadas pelo SQLite. As
+    consultas carregam apenas as chaves pedidas.
+
+    Cada gravação é uma transação confirmada no WAL: uma queda do processo no
+    meio de uma escrita descarta apenas a transação incompleta, nunca o banco.
+    """
+
+    def __init__(self, path=DB_FILE, json_path=JSON_CACHE_FILE):
+        self.path = path
+        self.json_path = json_path
+        self._local = threading.local()
+        self._migrate()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _migrate(self):
+        connection = self._connection()
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return
+
+        # BEGIN IMMEDIATE impede que dois processos apliquem a mesma migração
+        with self._transaction() as connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(connection, self.json_path)
+                connection.execute(f"PRAGMA user_version = {number}")
+
+    def _select_in(self, query, keys, params=()):
+        """Executa query com "IN ({keys})" em blocos de SQLITE_MAX_VARIABLES chaves."""
+        keys = list(keys)
+        connection = self._connection()
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            chunk = keys[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(chunk))
+            yield from connection.execute(query.format(keys=placeholders), [*chunk, *params])
+
+    @contextmanager
+    def _transaction(self):
+        """Transação de escrita; BEGIN IMMEDIATE reserva o lock já no início, evitando deadlocks."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get_many(self, keys):
+        """Retorna {key: (lat, lng)} apenas para as chaves encontradas."""
+        rows = self._select_in("SELECT key, lat, lng FROM coordinates WHERE key IN ({keys})", keys)
+        return {key: (lat, lng) for key, lat, lng in rows}
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Grava (upsert) vários pares {key: (lat, lng)} em uma única transação."""
+        now = time.time()
+        rows = [(key, lat, lng, now) for key, (lat, lng) in dict(items).items()]
+        if not rows:
+            return
+        with self._transaction() as connection:
+            connection.executemany(
+                """
+                INSERT INTO coordinates (key, lat, lng, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET lat = excluded.lat, lng = excluded.lng, updated_at = excluded.updated_at
+                """,
+                rows,
+            )
+            # Uma coordenada encontrada invalida a falha registrada anteriormente
+            connection.executemany("DELETE FROM failures WHERE key = ?", [(row[0],) for row in rows])
+
+    def put(self, key, lat, lng):
+        self.put_many({key: (lat, lng)})
+
+    def items(self):
+        """Itera sobre todas as coordenadas gravadas como (key, lat, lng)."""
+        yield from self._connection().execute("SELECT key, lat, lng FROM coordinates")
+
+    def get_failures(self, keys):
+        """Retorna {key: (reason, expires_at)} das falhas ainda não expiradas."""
+        rows = self._select_in(
+            "SELECT key, reason, expires_at FROM failures WHERE key IN ({keys}) AND expires_at > ?",
+            keys,
+            (time.time(),),
+        )
+        return {key: (reason, expires_at) for key, reason, expires_at in rows}
+
+    def put_failures(self, failures):
+        """Registra falhas {key: (reason, expires_at)}, com expires_at em segundos desde a época."""
+        now = time.time()
+        rows = [(key, reason, expires_at, now) for key, (reason, expires_at) in failures.items()]
+        if not rows:
+            return
+        with self._transaction() as connection:
+            connection.executemany(
+                """
+                INSERT INTO failures (key, reason, expires_at, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET reason = excluded.reason, expires_at = excluded.expires_at,
+                    updated_at = excluded.updated_at
+                """,
+                rows,
+            )
+
+    def rekey(self, key_function):
+        """
+        Regrava as chaves de coordenadas e falhas com key_function (ex.: addresses.canonicalize).
+
+        Chaves que passam a coincidir são unidas, mantendo a coordenada gravada
+        mais recentemente e a falha que expira por último; falhas de chaves que
+        já têm coordenadas são descartadas.
+
+        Retorna:
+            tuple: (coordenadas antes, coordenadas depois).
+        """
+        before = len(self)
+        with self._transaction() as connection:
+            rows = connection.execute("SELECT key, lat, lng, updated_at FROM coordinates ORDER BY updated_at").fetchall()
+            failures = connection.execute("SELECT key, reason, expires_at, updated_at FROM failures").fetchall()
+            connection.execute("DELETE FROM coordinates")
+            connection.execute("DELETE FROM failures")
+            connection.executemany(
+                "INSERT OR REPLACE INTO coordinates (key, lat, lng, updated_at) VALUES (?, ?, ?, ?)",
+                [(key_function(key), lat, lng, updated_at) for key, lat, lng, updated_at in rows],
+            )
+            connection.executemany(
+                """
+                INSERT INTO failures (key, reason, expires_at, updated_at) SELECT ?, ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM coordinates WHERE key = ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    reason = CASE WHEN excluded.expires_at > expires_at THEN excluded.reason ELSE reason END,
+                    expires_at = MAX(expires_at, excluded.expires_at)
+                """,
+                [
+                    (key_function(key), reason, expires_at, updated_at, key_function(key))
+                    for key, reason, expires_at, updated_at in failures
+                ],
+            )
+        return before, len(self)
+
+    def purge_failures(self, reason=None, expired_only=False):
+        """
+        Remove falhas registradas, forçando nova consulta à API.
+
+        Parâmetros:
+            reason (str): Remove apenas falhas deste motivo (todas, se None).
+            expired_only (bool): Remove apenas as já expiradas.
+
+        Retorna:
+            int: Quantidade de registros removidos.
+        """
+        conditions, params = [], []
+        if reason:
+            conditions.append("reason = ?")
+            params.append(reason)
+        if expired_only:
+            conditions.append("expires_at <= ?")
+            params.append(time.time())
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._transaction() as connection:
+            return connection.execute(f"DELETE FROM failures{where}", params).rowcount
+
+    def gazetteer_entries(self):
+        """Itera sobre as entradas importadas do gazetteer como (name, km, lat, lng)."""
+        yield from self._connection().execute("SELECT name, km, lat, lng FROM gazetteer")
+
+    def replace_gazetteer(self, rows, source):
+        """Substitui as entradas de uma origem (ex.: nome do CSV) por rows [(name, km, lat, lng)]."""
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM gazetteer WHERE source = ?", (source,))
+            connection.executemany(
+                "INSERT INTO gazetteer (name, km, lat, lng, source) VALUES (?, ?, ?, ?, ?)",
+                [(*row, source) for row in rows],
+            )
+
+    def checkpoint(self):
+        """
+        Incorpora o WAL ao arquivo principal e o trunca (PRAGMA wal_checkpoint(TRUNCATE)).
+
+        Retorna:
+            bool: False se leitores ativos impediram o checkpoint completo.
+        """
+        busy, _, _ = self._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return not busy
+
+    def backup(self, path):
+        """Copia o banco para path de forma consistente, via arquivo temporário + rename."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        target = sqlite3.connect(temp_path)
+        try:
+            self._connection().backup(target)
+        finally:
+            target.close()
+        os.replace(temp_path, path)
+
+    def export_json(self, path):
+        """Exporta as coordenadas no formato do cache JSON legado, via arquivo temporário + rename."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump({key: [lat, lng] for key, lat, lng in self.items()}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM coordinates").fetchone()[0]
+
+
+class CoordinateCache:
+    """
+    Cache de coordenadas em memória compartilhado por todas as sessões do processo.
+
+    Fica na frente do CoordinateStore: as chaves são carregadas do SQLite na
+    primeira consulta e mantidas uma única vez por processo, de modo que o que
+    uma sessão geocodifica passa a valer para todas. As gravações ficam
+    pendentes e são enviadas em bloco (upsert por chave, sem sobrescrever as
+    demais) quando acumulam FLUSH_SIZE itens ou quando uma nova gravação chega
+    FLUSH_INTERVAL segundos após o último flush. Não há timer: quem precisa do
+    dado no disco logo (ex.: após uma geocodificação paga) chama flush(); o
+    que estiver pendente no encerramento do processo é gravado por um hook de
+    atexit.
+    """
+
+    def __init__(self, store, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._coordinates = {}
+        self._failures = {}  # key -> (reason, expires_at)
+        self._pending = {}
+        self._pending_failures = {}
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}  # key -> número de gravações de coordenadas da chave neste processo
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Mantém os flushes na ordem das gravações
+        self._last_flush = time.monotonic()
+        self._last_checkpoint = time.monotonic()
+        atexit.register(self.close)
+
+    def get_many(self, keys):
+        """Retorna {key: (lat, lng)} das chaves conhecidas, consultando o SQLite só para as ausentes."""
+        keys = {key for key in keys if key}
+        with self._lock:
+            found = {key: self._coordinates[key] for key in keys if key in self._coordinates}
+        missing = keys - found.keys()
+        if missing:
+            stored = self.store.get_many(missing)
+            with self._lock:
+                for key, coordinates in stored.items():
+                    found[key] = self._coordinates.setdefault(key, coordinates)
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def hit_rate(self):
+        """Fração das chaves consultadas que já tinham coordenadas (memória ou SQLite)."""
+        with self._lock:
+            total = self.hits + self.misses
+            return self.hits / total if total else 0.0
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_failures(self, keys):
+        """Retorna {key: reason} das falhas não expiradas entre as chaves sem coordenadas."""
+        keys = {key for key in keys if key}
+        now = time.time()
+        with self._lock:
+            known = {key: self._failures[key] for key in keys if key in self._failures}
+        missing = keys - known.keys()
+        if missing:
+            stored = self.store.get_failures(missing)
+            with self._lock:
+                for key, failure in stored.items():
+                    known[key] = self._failures.setdefault(key, failure)
+        return {key: reason for key, (reason, expires_at) in known.items() if expires_at > now}
+
+    def put_many(self, items):
+        """Registra coordenadas {key: (lat, lng)}, visíveis imediatamente para todas as sessões."""
+        items = dict(items)
+        with self._lock:
+            self._coordinates.update(items)
+            self._pending.update(items)
+            for key in items:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._failures.pop(key, None)
+                self._pending_failures.pop(key, None)
+        self._maybe_flush()
+
+    def version(self, keys):
+        """
+        Versão das coordenadas de um conjunto de chaves, para chaves de resultados.
+
+        Só muda quando alguma das chaves recebe coordenadas; gravações de
+        outras chaves (outras sessões, outros filtros) não a alteram.
+        """
+        with self._lock:
+            return sum(self._versions.get(key, 0) for key in keys)
+
+    def put(self, key, lat, lng):
+        self.put_many({key: (lat, lng)})
+
+    def put_failures(self, failures, ttl_by_reason):
+        """
+        Registra falhas {key: reason} com expiração definida por ttl_by_reason[reason] (segundos).
+
+        Motivos sem TTL (ou com TTL 0) não são armazenados.
+        """
+        now = time.time()
+        entries = {
+            key: (reason, now + ttl_by_reason[reason])
+            for key, reason in failures.items()
+            if ttl_by_reason.get(reason)
+        }
+        with self._lock:
+            self._failures.update(entries)
+            self._pending_failures.update(entries)
+        self._maybe_flush()
+
+    def forget_failures(self, reason=None):
+        """Descarta da memória as falhas (todas ou de um motivo), após um purge no SQLite."""
+        with self._lock:
+            for failures in (self._failures, self._pending_failures):
+                for key in [key for key, (value, _) in failures.items() if reason in (None, value)]:
+                    del failures[key]
+
+    def _maybe_flush(self):
+        with self._lock:
+            pending = len(self._pending) + len(self._pending_failures)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if pending and (pending >= self.flush_size or due):
+            self.flush()
+
+    def flush(self):
+        """Grava no SQLite as entradas pendentes; em caso de erro, elas voltam para a fila."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                pending_failures, self._pending_failures = self._pending_failures, {}
+                self._last_flush = time.monotonic()
+            try:
+                self.store.put_many(pending)
+                self.store.put_failures(pending_failures)
+            except sqlite3.Error as e:
+                print(f"Erro ao gravar o cache de coordenadas: {e}")
+                with self._lock:
+                    # Entradas gravadas durante a falha são mais recentes e prevalecem
+                    self._pending = {**pending, **self._pending}
+                    self._pending_failures = {**pending_failures, **self._pending_failures}
+                return
+            if time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL:
+                self._checkpoint()
+
+    def _checkpoint(self):
+        try:
+            self.store.checkpoint()
+        except sqlite3.Error as e:
+            print(f"Erro no checkpoint do cache de coordenadas: {e}")
+        self._last_checkpoint = time.monotonic()
+
+    def close(self):
+        """Grava as entradas pendentes e compacta o WAL; chamado automaticamente no encerramento."""
+        self.flush()
+        with self._flush_lock:
+            self._checkpoint()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._coordinates)
+
+
+def key_statistics(store, locations, key_function):
+    """
+    Mede o efeito de uma função de chave sobre os endereços de uma planilha.
+
+    Parâmetros:
+        store (CoordinateStore): Cache consultado.
+        locations (iterable): Endereços, um por linha (com repetições).
+        key_function (callable): Converte o endereço em chave do cache.
+
+    Retorna:
+        dict: Chaves distintas, chaves encontradas e taxa de acerto por linha.
+    """
+    keys = [key_function(local) for local in locations if isinstance(local, str)]
+    found = store.get_many(set(keys))
+    hits = sum(key in found for key in keys)
+    return {
+        "distinct_keys": len(set(keys)),
+        "cached_keys": len(found),
+        "hit_rate": hits / len(keys) if keys else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manutenção do cache de coordenadas.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    purge = subparsers.add_parser("purge-failures", help="Remove falhas registradas (cache negativo).")
+    purge.add_argument("--reason", help="Motivo a remover (ex.: no_result, http_error, timeout).")
+    purge.add_argument("--expired-only", action="store_true", help="Remove apenas falhas já expiradas.")
+    subparsers.add_parser("rekey", help="Converte as chaves existentes para a forma canônica de endereço.")
+    subparsers.add_parser("checkpoint", help="Incorpora o WAL ao arquivo principal do banco.")
+    backup = subparsers.add_parser("backup", help="Gera uma cópia consistente do banco.")
+    backup.add_argument("path", help="Arquivo de destino.")
+    export = subparsers.add_parser("export-json", help="Exporta as coordenadas no formato JSON legado.")
+    export.add_argument("path", help="Arquivo de destino.")
+    stats = subparsers.add_parser("stats", help="Compara chaves normalizadas e canônicas sobre uma planilha.")
+    stats.add_argument("file", help="Planilha (.xlsx) com a coluna Local da Infração.")
+    parser.add_argument("--db", default=DB_FILE, help="Arquivo SQLite do cache.")
+    args = parser.parse_args()
+
+    store = CoordinateStore(args.db)
+    if args.command == "purge-failures":
+        removed = store.purge_failures(args.reason, args.expired_only)
+        print(f"{removed} falhas removidas.")
+    elif args.command == "rekey":
+        from addresses import canonicalize
+
+        before, after = store.rekey(canonicalize)
+        print(f"{before} chaves convertidas em {after} chaves canônicas.")
+    elif args.command == "checkpoint":
+        print("Checkpoint concluído." if store.checkpoint() else "Checkpoint parcial: há leitores ativos.")
+    elif args.command == "backup":
+        store.backup(args.path)
+        print(f"Cópia gravada em {args.path}.")
+    elif args.command == "export-json":
+        store.export_json(args.path)
+        print(f"{len(store)} coordenadas exportadas para {args.path}.")
+    else:
+        import pandas as pd
+        from addresses import canonicalize
+        from geo_utils import normalize_text
+        from schema import LOCAL_INFRACAO, name_columns
+
+        locations = name_columns(pd.read_excel(args.file))[LOCAL_INFRACAO]
+        for label, key_function in (("normalizada", normalize_text), ("canônica", canonicalize)):
+            result = key_statistics(store, locations, key_function)
+            print(
+                f"Chave {label}: {result['distinct_keys']} chaves distintas, "
+                f"{result['cached_keys']} no cache, taxa de acerto {result['hit_rate']:.1%}"
+            )
@@ -0,0 +1,145 @@
+import os
+import pandas as pd
+import streamlit as st
+from drive_loader import fetch_file_from_drive, get_file_metadata, get_file_revision
+from schema import (
+    name_columns, cast_text_columns, MONEY_COLUMNS, DATE_COLUMNS, AUTO_INFRACAO, DIA_CONSULTA
+)
+from parsers import parse_brl_to_centavos, parse_dates
+from filter_index import FilterIndex
+
+SNAPSHOT_DIR = os.path.join(".cache", "snapshots")
+# Incrementar sempre que o pré-processamento mudar, invalidando snapshots antigos
+SNAPSHOT_VERSION = 4
+
+
+def preprocess_data(file_buffer):
+    data = name_columns(pd.read_excel(file_buffer))
+
+    # Valores monetários (valor_original e valor_pagar) em centavos inteiros
+    for col in MONEY_COLUMNS:
+        data[col] = parse_brl_to_centavos(data[col])
+
+    # Datas (consulta, pagamento com desconto e infração)
+    for col in DATE_COLUMNS:
+        data[col] = parse_dates(data[col])
+
+    # Textos com tipos explícitos (categóricos para baixa cardinalidade)
+    return cast_text_columns(data)
+
+
+def deduplicate_fines(data):
+    """
+    Mantém uma linha por Auto de Infração.
+
+    Entre duplicatas vence a consulta mais recente (Dia da Consulta); em caso
+    de empate, a primeira linha da planilha. Linhas sem Auto de Infração (ex.:
+    "Sem multas registradas") não são multas e ficam de fora. A ordem original
+    das linhas é preservada.
+    """
+    fines = data[data[AUTO_INFRACAO].notna()]
+    latest_first = fines[DIA_CONSULTA].sort_values(ascending=False, kind="mergesort", na_position="last").index
+    return fines.loc[latest_first].drop_duplicates(subset=[AUTO_INFRACAO], keep="first").sort_index()
+
+
+class Dataset:
+    """
+    Dados de uma revisão da planilha, compartilhados (somente leitura) entre as sessões.
+
+    Atributos:
+        revision (str): Identificador da revisão do arquivo no Drive.
+        data (DataFrame): Todas as linhas pré-processadas da planilha.
+        unique_fines (DataFrame): Uma linha por Auto de Infração (ver deduplicate_fines).
+        filter_index (FilterIndex): Índices dos filtros sobre unique_fines.
+    """
+
+    def __init__(self, revision, data):
+        self.revision = revision
+        self.data = data
+        self.unique_fines = deduplicate_fines(data)
+        self.filter_index = FilterIndex(self.unique_fines)
+
+
+def snapshot_path(revision):
+    return os.path.join(SNAPSHOT_DIR, f"{revision}-v{SNAPSHOT_VERSION}.parquet")
+
+
+def write_snapshot(data, path):
+    """
+    Persiste o DataFrame pré-processado em Parquet de forma atômica (temp + rename).
+
+    Colunas fora do esquema com tipos mistos são gravadas como string para
+    manter o esquema Arrow consistente.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = data.copy()
+    for col in snapshot.columns:
+        if snapshot[col].dtype == object:
+            snapshot[col] = snapshot[col].astype("string")
+    snapshot.columns = [str(col) for col in snapshot.columns]
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    snapshot.to_parquet(temp_path, engine="pyarrow", index=False)
+    os.replace(temp_path, path)
+
+
+def prune_snapshots(keep_path):
+    """Remove os snapshots de outras revisões (e de versões anteriores do pré-processamento)."""
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        if name.endswith(".parquet") and path != keep_path:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Erro ao remover snapshot antigo {path}: {e}")
+
+
+def read_snapshot(path):
+    """Carrega o snapshot com memory mapping; tipos categóricos são preservados pelo Arrow."""
+    return pd.read_parquet(path, engine="pyarrow", memory_map=True)
+
+
+@st.cache_resource(max_entries=2, show_spinner="Carregando dados...")
+def load_revision(revision, file_id, _credentials_info):
+    """
+    Retorna o Dataset de uma revisão da planilha.
+
+    A leitura do XLSX acontece no máximo uma vez por revisão: as execuções
+    seguintes (e os demais processos) carregam o snapshot Parquet. A
+    deduplicação das multas e os índices dos filtros são calculados uma vez
+    por revisão em cada processo. O
+    objeto retornado é compartilhado entre as sessões e não deve ser alterado.
+
+    Um download com checksum divergente lança ValueError (ver
+    fetch_file_from_drive) antes de qualquer snapshot ser gravado.
+    """
+    path = snapshot_path(revision)
+    if not os.path.exists(path):
+        # O arquivo pode ter mudado desde a consulta dos metadados: vale a revisão do conteúdo baixado
+        revision, file_buffer = fetch_file_from_drive(file_id, _credentials_info)
+        path = snapshot_path(revision)
+        data = preprocess_data(file_buffer)
+        try:
+            write_snapshot(data, path)
+            prune_snapshots(path)
+        except (OSError, ValueError) as e:
+            print(f"Erro ao gravar o snapshot dos dados: {e}")
+            return Dataset(revision, data)
+
+    return Dataset(revision, read_snapshot(path))
+
+
+def load_data_from_drive(file_id, credentials_info):
+    """
+    Carrega os dados da planilha do Drive usando o snapshot da revisão atual.
+
+    Parâmetros:
+        file_id (str): ID do arquivo no Google Drive.
+        credentials_info (dict): Credenciais da conta de serviço.
+
+    Retorna:
+        Dataset: Dados da revisão atual, com as multas únicas já calculadas.
+    """
+    metadata = get_file_metadata(file_id, credentials_info)
+    revision = get_file_revision(metadata)
+    return load_revision(revision, file_id, credentials_info)
@@ -0,0 +1,131 @@
+import os
+import io
+import hashlib
+import streamlit as st
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
+
+DRIVE_CACHE_DIR = os.path.join(".cache", "drive")
+METADATA_TTL = 60  # Segundos entre consultas de metadados ao Drive
+METADATA_FIELDS = "id,name,mimeType,modifiedTime,md5Checksum,version"
+
+
+@st.cache_resource
+def get_drive_service(credentials_info):
+    """
+    Cria o cliente do Drive uma única vez por processo para as mesmas credenciais.
+    """
+    credentials = Credentials.from_service_account_info(credentials_info)
+    return build('drive', 'v3', credentials=credentials, cache_discovery=False)
+
+
+def request_file_metadata(file_id, credentials_info):
+    """Consulta os metadados do arquivo no Drive (modifiedTime, md5Checksum, version), sem cache."""
+    drive_service = get_drive_service(credentials_info)
+    return drive_service.files().get(fileId=file_id, fields=METADATA_FIELDS).execute()
+
+
+@st.cache_data(ttl=METADATA_TTL, show_spinner=False)
+def get_file_metadata(file_id, credentials_info):
+    """
+    Consulta apenas os metadados do arquivo (modifiedTime, md5Checksum, version).
+
+    O resultado fica em cache por METADATA_TTL segundos, de modo que interações
+    dentro dessa janela não fazem nenhuma chamada ao Drive.
+    """
+    return request_file_metadata(file_id, credentials_info)
+
+
+def get_file_revision(metadata):
+    """
+    Retorna a chave de revisão do arquivo.
+
+    Usa o md5Checksum quando disponível (arquivos binários como XLSX); caso
+    contrário, deriva uma chave estável de id + version + modifiedTime.
+    """
+    if metadata.get("md5Checksum"):
+        return metadata["md5Checksum"]
+    raw_key = f"{metadata.get('id')}:{metadata.get('version')}:{metadata.get('modifiedTime')}"
+    return hashlib.md5(raw_key.encode("utf-8")).hexdigest()
+
+
+def _stored_file_path(revision):
+    return os.path.join(DRIVE_CACHE_DIR, f"{revision}.xlsx")
+
+
+def download_file_from_drive(file_id, credentials_info):
+    drive_service = get_drive_service(credentials_info)
+    request = drive_service.files().get_media(fileId=file_id)
+    file_buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(file_buffer, request)
+
+    done = False
+    while not done:
+        _, done = downloader.next_chunk()
+
+    file_buffer.seek(0)
+    return file_buffer
+
+
+def _prune_stored_files(keep_path):
+    """Remove as planilhas de revisões anteriores, mantendo apenas keep_path."""
+    for name in os.listdir(DRIVE_CACHE_DIR):
+        path = os.path.join(DRIVE_CACHE_DIR, name)
+        if name.endswith(".xlsx") and path != keep_path:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Erro ao remover revisão antiga {path}: {e}")
+
+
+def _store_file(revision, content):
+    """Grava o conteúdo no armazenamento local de forma atômica (temp + rename) e descarta revisões antigas."""
+    os.makedirs(DRIVE_CACHE_DIR, exist_ok=True)
+    path = _stored_file_path(revision)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(content)
+    os.replace(temp_path, path)
+    _prune_stored_files(path)
+
+
+def fetch_file_from_drive(file_id, credentials_info):
+    """
+    Obtém a planilha do Drive somente quando a revisão mudou.
+
+    Parâmetros:
+        file_id (str): ID do arquivo no Google Drive.
+        credentials_info (dict): Credenciais da conta de serviço.
+
+    Retorna:
+        tuple: (revision, file_buffer) onde revision identifica o conteúdo do
+        arquivo e file_buffer é um BytesIO posicionado no início. Se o
+        conteúdo baixado não corresponder ao md5Checksum do Drive, lança ValueError.
+    """
+    revision = get_file_revision(get_file_metadata(file_id, credentials_info))
+    path = _stored_file_path(revision)
+
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            return revision, io.BytesIO(file.read())
+
+    file_buffer = download_file_from_drive(file_id, credentials_info)
+    content = file_buffer.getvalue()
+
+    # Os metadados em cache podem ser de antes de uma nova versão do arquivo:
+    # a revisão do conteúdo baixado vem de uma consulta feita junto com o download
+    metadata = request_file_metadata(file_id, credentials_info)
+    revision = get_file_revision(metadata)
+
+    # Recusar downloads corrompidos (ou de um arquivo alterado durante o download)
+    # quando o Drive informa o checksum: nada é armazenado nem pré-processado
+    if metadata.get("md5Checksum") and hashlib.md5(content).hexdigest() != metadata["md5Checksum"]:
+        raise ValueError(f"Checksum divergente para o arquivo {file_id}; tente novamente em instantes.")
+
+    try:
+        _store_file(revision, content)
+    except OSError as e:
+        print(f"Erro ao armazenar o arquivo localmente: {e}")
+
+    return revision, file_buffer
@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+from schema import (
+    PLACA, STATUS, ENQUADRAMENTO, DATA_INFRACAO, HORA, VALOR_A_PAGAR, STATUS_PAGAMENTO, ORGAO_EMISSOR,
+    AGENTE_EMISSOR
+)
+
+# Colunas com índice invertido (valor -> linhas)
+INDEXED_COLUMNS = [ENQUADRAMENTO, PLACA, STATUS, STATUS_PAGAMENTO, ORGAO_EMISSOR, AGENTE_EMISSOR]
+MISSING = np.iinfo(np.int64).min  # Valor ausente nos índices por intervalo (fica antes de qualquer limite)
+
+
+def day_numbers(values):
+    """Converte datas (array-like ou escalar) em dias desde 1970-01-01; NaT vira o menor int64."""
+    return np.asarray(values, dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+
+
+def hour_minutes(series):
+    """Converte horas no formato "HH:MM" em minutos desde 00:00; valores ausentes ou inválidos viram MISSING."""
+    codes, values = categorical_codes(series)
+    parts = pd.Series(values, dtype="string").str.extract(r"^\s*(\d{1,2}):(\d{2})")
+    minutes = (pd.to_numeric(parts[0]) * 60 + pd.to_numeric(parts[1])).fillna(MISSING).to_numpy(dtype=np.int64)
+    return np.append(minutes, MISSING)[codes]  # Código -1 (nulo) aponta para o MISSING extra
+
+
+def categorical_codes(series):
+    """
+    Codifica uma coluna como inteiros.
+
+    Retorna:
+        tuple: (códigos por linha, com -1 para nulos; valores correspondentes aos códigos, ordenados).
+    """
+    categorical = series.array if isinstance(series.dtype, pd.CategoricalDtype) else pd.Categorical(series)
+    return np.asarray(categorical.codes), list(categorical.categories)
+
+
+def inverted_index(codes, values):
+    """
+    Agrupa as posições (iloc) das linhas por valor.
+
+    Parâmetros:
+        codes (ndarray): Código de cada linha (ver categorical_codes); -1 fica de fora.
+        values (list): Valor de cada código.
+
+    Retorna:
+        dict: valor -> ndarray com as posições das linhas, em ordem crescente.
+    """
+    order = np.argsort(codes, kind="stable")
+    starts = np.searchsorted(codes[order], np.arange(len(values) + 1))
+    return {
+        value: order[start:end]
+        for value, start, end in zip(values, starts[:-1], starts[1:])
+        if end > start
+    }
+
+
+class FilterIndex:
+    """
+    Índices e metadados dos filtros de uma versão dos dados, montados uma única vez.
+
+    Data, hora (minutos desde 00:00) e valor a pagar (centavos) ficam como
+    arrays ordenados, de modo que um intervalo é resolvido com duas buscas
+    binárias; as colunas de texto têm índices invertidos sobre os códigos
+    categóricos. Cada filtro marca as linhas aceitas em uma máscara booleana
+    e as máscaras são combinadas, sem percorrer o DataFrame nem comparar
+    objetos de data a cada execução.
+
+    Atributos:
+        date_bounds (tuple): Data da infração mais antiga e mais recente (NaT se não houver).
+        counts (dict): coluna -> {valor: quantidade de linhas}, em ordem de valor.
+
+    Parâmetros:
+        data (DataFrame): Dados a filtrar (não devem ser alterados depois).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.date_bounds = (data[DATA_INFRACAO].min(), data[DATA_INFRACAO].max())
+
+        self._ranges = {}  # coluna -> (posições em ordem de valor, valores ordenados)
+        range_values = {DATA_INFRACAO: day_numbers(data[DATA_INFRACAO])}
+        if HORA in data:
+            range_values[HORA] = hour_minutes(data[HORA])
+        if VALOR_A_PAGAR in data:
+            range_values[VALOR_A_PAGAR] = data[VALOR_A_PAGAR].to_numpy(dtype=np.int64, na_value=MISSING)
+        for column, values in range_values.items():
+            order = np.argsort(values, kind="stable")
+            self._ranges[column] = (order, values[order])
+
+        self._codes, self._values, self._indexes, self.counts = {}, {}, {}, {}
+        for column in INDEXED_COLUMNS:
+            if column in data:
+                codes, values = categorical_codes(data[column])
+                self._codes[column], self._values[column] = codes, values
+                self._indexes[column] = inverted_index(codes, values)
+                self.counts[column] = {value: len(rows) for value, rows in self._indexes[column].items()}
+
+    def __len__(self):
+        return len(self.data)
+
+    def range_bounds(self, column):
+        """Menor e maior valor (nas unidades do índice) de uma coluna com índice por intervalo, ou None."""
+        if column not in self._ranges:
+            return None
+        _, values = self._ranges[column]
+        first = np.searchsorted(values, MISSING, side="right")
+        if first == len(values):
+            return None
+        return int(values[first]), int(values[-1])
+
+    def range_rows(self, column, low, high):
+        """Posições das linhas com valor de column entre low e high (inclusive, nas unidades do índice)."""
+        order, values = self._ranges[column]
+        first = np.searchsorted(values, max(low, MISSING + 1), side="left")
+        last = np.searchsorted(values, high, side="right")
+        return order[first:last]
+
+    def date_rows(self, start, end):
+        """Posições das linhas com data da infração entre start e end (inclusive)."""
+        low, high = day_numbers([start, end])
+        return self.range_rows(DATA_INFRACAO, low, high)
+
+    def options(self, column):
+        """Valores presentes na coluna, em ordem."""
+        return list(self.counts.get(column, {}))
+
+    def available(self, column, start, end, selections=None, ranges=None):
+        """
+        Valores de column (com a quantidade de linhas) que restam com os demais filtros.
+
+        Ex.: os códigos de infração das placas selecionadas no período. Usa as
+        linhas selecionadas pelos índices, sem percorrer o DataFrame.
+
+        Parâmetros:
+            column (str): Coluna cujas opções são calculadas.
+            start (date): Data inicial.
+            end (date): Data final.
+            selections (dict): Filtros das demais colunas (o de column é ignorado).
+            ranges (dict): Filtros por intervalo (ver select).
+
+        Retorna:
+            dict: valor -> quantidade de linhas, em ordem de valor.
+        """
+        if column not in self._codes:
+            return {}
+        others = {other: values for other, values in (selections or {}).items() if other != column}
+        positions = self.select(start, end, others, ranges)
+        if len(positions) == len(self.data):
+            return self.counts[column]
+
+        codes = self._codes[column][positions]
+        totals = np.bincount(codes[codes >= 0], minlength=len(self._values[column]))
+        return {self._values[column][code]: int(totals[code]) for code in np.flatnonzero(totals)}
+
+    def value_rows(self, column, values):
+        """Posições das linhas em que column assume um dos valores informados."""
+        index = self._indexes.get(column, {})
+        rows = [index[value] for value in values if value in index]
+        return np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+
+    def select(self, start, end, selections=None, ranges=None):
+        """
+        Calcula as linhas que atendem a todos os filtros.
+
+        Parâmetros:
+            start (date): Data inicial.
+            end (date): Data final.
+            selections (dict): coluna -> valores aceitos; listas vazias não filtram.
+            ranges (dict): coluna -> (mínimo, máximo) nas unidades do índice (minutos
+                para Hora, centavos para Valor a Pagar); None não filtra.
+
+        Retorna:
+            ndarray: Posições (iloc) das linhas selecionadas, em ordem crescente.
+        """
+        mask = np.zeros(len(self.data), dtype=bool)
+        mask[self.date_rows(start, end)] = True
+        for column, values in (selections or {}).items():
+            if values:
+                accepted = np.zeros(len(self.data), dtype=bool)
+                accepted[self.value_rows(column, values)] = True
+                mask &= accepted
+        for column, limits in (ranges or {}).items():
+            if limits is not None and column in self._ranges:
+                accepted = np.zeros(len(self.data), dtype=bool)
+                accepted[self.range_rows(column, *limits)] = True
+                mask &= accepted
+        return np.flatnonzero(mask)
+
+    def filter(self, start, end, selections=None, ranges=None):
+        """
+        Aplica os filtros e retorna o DataFrame resultante.
+
+        Quando todas as linhas são selecionadas, retorna os próprios dados, sem cópia.
+        """
+        positions = self.select(start, end, selections, ranges)
+        if len(positions) == len(self.data):
+            return self.data
+        return self.data.iloc[positions]
@@ -1,8 +1,40 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, time
+from schema import (
+    PLACA, STATUS, ENQUADRAMENTO, DATA_INFRACAO, HORA, VALOR_A_PAGAR, STATUS_PAGAMENTO, ORGAO_EMISSOR,
+    AGENTE_EMISSOR
+)
+from filter_index import FilterIndex
 
-def apply_filters(data):
+# Filtros de múltipla escolha: (coluna, rótulo, chave do widget e do dicionário de filtros ativos)
+TEXT_FILTERS = [
+    (ENQUADRAMENTO, "Código da Infração", "codigo_infracao"),
+    (PLACA, "Placa do Veículo", "placa"),
+    (STATUS, "Status", "status"),
+    (STATUS_PAGAMENTO, "Status de Pagamento", "status_pagamento"),
+    (ORGAO_EMISSOR, "Órgão Emissor", "orgao_emissor"),
+    (AGENTE_EMISSOR, "Agente Emissor", "agente_emissor"),
+]
+
+def _with_selected(options, selected):
+    """Opções disponíveis mais as já selecionadas (que o multiselect exige entre as opções), em ordem."""
+    missing = [value for value in selected if value not in options]
+    return sorted([*options, *missing]) if missing else list(options)
+
+
+def apply_filters(data, index=None):
+    """
+    Exibe os filtros e aplica-os aos dados.
+
+    Parâmetros:
+        data (DataFrame): Dados a filtrar.
+        index (FilterIndex): Índices já montados sobre data (montados aqui se None).
+
+    Retorna:
+        tuple: (DataFrame filtrado, dict com os valores dos filtros ativos), o
+        segundo usado para identificar o estado dos filtros em caches.
+    """
     # Estilo para o expander e o aviso de filtro
     st.markdown(
         """
@@ -45,9 +77,12 @@ def apply_filters(data):
     with st.expander("🔧 Filtros para Refinamento de Dados", expanded=False):
         st.markdown('<p class="filtro-alerta">Ajuste os filtros para uma análise detalhada das multas.</p>', unsafe_allow_html=True)
         
+        # Índices, opções e datas extremas calculados uma vez por versão dos dados
+        if index is None:
+            index = FilterIndex(data)
+
         # Encontrar a data mais antiga e mais recente nos dados
-        min_date = pd.to_datetime(data[9]).min()
-        max_date = pd.to_datetime(data[9]).max()
+        min_date, max_date = index.date_bounds
         
         if pd.isna(min_date):
             min_date = datetime(2017, 1, 1)
@@ -61,36 +96,58 @@ def apply_filters(data):
         data_inicio = st.date_input("Data de Início", value=min_date)
         data_fim = st.date_input("Data Final", value=max_date)
         
-        codigo_infracao_opcoes = data[8].dropna().unique()
-        if len(codigo_infracao_opcoes) > 0:
-            codigo_infracao = st.multiselect("Código da Infração", options=sorted(codigo_infracao_opcoes))
-        
-        placa_opcoes = data[2].dropna().unique()
-        if len(placa_opcoes) > 0:
-            placa = st.multiselect("Placa do Veículo", options=sorted(placa_opcoes))
-        
-        # Aplicar filtros
-        filtered_data = data.copy()
-        
-        # Filtro de data
-        filtered_data[9] = pd.to_datetime(filtered_data[9])
-        filtered_data = filtered_data[
-            (filtered_data[9].dt.date >= data_inicio) & 
-            (filtered_data[9].dt.date <= data_fim)
-        ]
+        # Hora e valor: só filtram quando o intervalo é diferente do total
+        ranges = {}
+        if index.range_bounds(HORA) is not None:
+            hora_inicio, hora_fim = st.slider(
+                "Hora da Infração", min_value=time(0, 0), max_value=time(23, 59), value=(time(0, 0), time(23, 59))
+            )
+            if (hora_inicio, hora_fim) != (time(0, 0), time(23, 59)):
+                ranges[HORA] = (hora_inicio.hour * 60 + hora_inicio.minute, hora_fim.hour * 60 + hora_fim.minute)
+
+        valor_limites = index.range_bounds(VALOR_A_PAGAR)
+        if valor_limites is not None and valor_limites[0] < valor_limites[1]:
+            valor_minimo, valor_maximo = (centavos / 100 for centavos in valor_limites)
+            valor_inicio, valor_fim = st.slider(
+                "Valor a Pagar (R$)",
+                min_value=valor_minimo,
+                max_value=valor_maximo,
+                value=(valor_minimo, valor_maximo),
+                step=0.01,
+                format="R$ %.2f",
+            )
+            if (valor_inicio, valor_fim) != (valor_minimo, valor_maximo):
+                ranges[VALOR_A_PAGAR] = (round(valor_inicio * 100), round(valor_fim * 100))
+
+        # Opções em cascata: cada lista mostra apenas os valores que restam com os demais filtros
+        # (ex.: códigos das placas selecionadas, no período), com a quantidade de multas de cada opção
+        selections = {column: st.session_state.get(f"filtro_{key}", []) for column, _, key in TEXT_FILTERS}
+        for column, label, key in TEXT_FILTERS:
+            if index.counts.get(column):
+                opcoes = index.available(column, data_inicio, data_fim, selections, ranges)
+                selections[column] = st.multiselect(
+                    label,
+                    options=_with_selected(opcoes, selections[column]),
+                    format_func=lambda value, opcoes=opcoes: f"{value} ({opcoes.get(value, 0)})",
+                    key=f"filtro_{key}",
+                )
+            else:
+                selections[column] = []
         
-        # Filtro de código de infração
-        if codigo_infracao:
-            filtered_data = filtered_data[filtered_data[8].isin(codigo_infracao)]
-            
-        # Filtro de placa
-        if placa:
-            filtered_data = filtered_data[filtered_data[2].isin(placa)]
+        # Aplicar filtros pelos índices (intervalos e valores selecionados)
+        filtered_data = index.filter(data_inicio, data_fim, selections, ranges)
             
         # Debug - mostrar contagem após filtros
         st.write("Total de registros após filtros:", len(filtered_data))
-        st.write("Anos únicos após filtros:", sorted(filtered_data[9].dt.year.unique()))
+        st.write("Anos únicos após filtros:", sorted(filtered_data[DATA_INFRACAO].dt.year.unique()))
         
-        return filtered_data
+        filters = {
+            "data_inicio": data_inicio,
+            "data_fim": data_fim,
+            "hora": ranges.get(HORA),
+            "valor": ranges.get(VALOR_A_PAGAR),
+            **{key: sorted(selections[column]) for column, _, key in TEXT_FILTERS},
+        }
+        return filtered_data, filters
         
-    return data
+    return data, {}
@@ -0,0 +1,242 @@
+import os
+import csv
+import math
+import difflib
+import threading
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from addresses import HIGHWAY_TOKEN, STREET_TYPES, parse_address
+
+MIN_CONFIDENCE = 0.75  # Abaixo disso o endereço segue para a API de geocodificação
+FUZZY_CUTOFF = 0.8  # Similaridade mínima (difflib) para aceitar um token com erro de digitação
+FUZZY_MIN_LENGTH = 4  # Tokens curtos não passam pela busca aproximada
+FUZZY_ONLY_CONFIDENCE = 0.7  # Teto quando o nome do logradouro só coincide por aproximação (abaixo de MIN_CONFIDENCE)
+CITY_MISMATCH_FACTOR = 0.4  # Mesmo logradouro em outro município
+NEAREST_NUMBER_FACTOR = 0.85  # Logradouro certo, mas número diferente do conhecido (ou não informado)
+NUMBER_CONFIDENCE_RANGE = 1000  # Distância ao número conhecido mais próximo em que a confiança chega a zero
+MISSING_NUMBER_FACTOR = 0.5  # Número informado, mas logradouro sem números conhecidos
+KM_CONFIDENCE_RANGE = 20.0  # Distância (km) ao marco mais próximo em que a confiança chega a zero
+MISSING_KM_FACTOR = 0.3  # Rodovia conhecida, mas sem marcos quilométricos
+
+Match = namedtuple("Match", ["lat", "lng", "confidence", "name"])
+
+
+class Gazetteer:
+    """
+    Índice local de logradouros e marcos quilométricos para geocodificar sem rede.
+
+    Cada lugar é identificado pelos tokens do logradouro (apenas o código, no
+    caso de rodovias) e pelo município, e guarda os pontos conhecidos com km e
+    número. A busca usa um índice invertido de tokens ponderados por IDF,
+    aceita tokens com pequenos erros de digitação e interpola a posição entre
+    marcos quilométricos.
+    """
+
+    def __init__(self):
+        self._places = {}  # (street, city) -> [(km, number, lat, lng)]
+        self._index = defaultdict(set)  # token -> lugares que o contêm
+        self._fuzzy = {}  # token fora do vocabulário -> (token do vocabulário ou None, similaridade)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, store):
+        """Monta o índice com as coordenadas já geocodificadas e as entradas importadas do CoordinateStore."""
+        gazetteer = cls()
+        for key, lat, lng in store.items():
+            gazetteer.add(key, lat, lng)
+        for name, km, lat, lng in store.gazetteer_entries():
+            gazetteer.add(name, lat, lng, km)
+        return gazetteer
+
+    @staticmethod
+    def _place_key(address):
+        # Rodovias atravessam vários municípios; o km é que localiza o ponto
+        if all(HIGHWAY_TOKEN.match(token) for token in address.street):
+            return address.street, None
+        return address.street, address.city
+
+    def add(self, name, lat, lng, km=None):
+        """Adiciona um endereço (ou logradouro com km) de coordenadas conhecidas."""
+        address = parse_address(name)
+        if not address.street:
+            return
+        key = self._place_key(address)
+        with self._lock:
+            self._places.setdefault(key, []).append((km if km is not None else address.km, address.number, lat, lng))
+            for token in key[0]:
+                if token not in self._index:
+                    self._fuzzy.clear()  # Vocabulário mudou
+                self._index[token].add(key)
+
+    def __len__(self):
+        return len(self._places)
+
+    def _weight(self, token):
+        return math.log(1 + len(self._places) / (len(self._index.get(token, ())) or 1))
+
+    def _resolve(self, token):
+        """Retorna (token do vocabulário, similaridade), aproximando tokens desconhecidos."""
+        if token in self._index:
+            return token, 1.0
+        if token not in self._fuzzy:
+            close = []
+            if len(token) >= FUZZY_MIN_LENGTH and token.isalpha():
+                close = difflib.get_close_matches(token, list(self._index), n=1, cutoff=FUZZY_CUTOFF)
+            similarity = difflib.SequenceMatcher(None, token, close[0]).ratio() if close else 0.0
+            self._fuzzy[token] = (close[0] if close else None, similarity)
+        return self._fuzzy[token]
+
+    def _locate(self, points, address):
+        """Escolhe (lat, lng, fator de confiança) entre os pontos conhecidos de um lugar."""
+        if address.km is not None:
+            markers = sorted((km, lat, lng) for km, _, lat, lng in points if km is not None)
+            if not markers:
+                _, _, lat, lng = points[0]
+                return lat, lng, MISSING_KM_FACTOR
+            kms = [marker[0] for marker in markers]
+            position = bisect_left(kms, address.km)
+            if position < len(kms) and kms[position] == address.km:
+                return markers[position][1], markers[position][2], 1.0
+            if 0 < position < len(kms):
+                (km0, lat0, lng0), (km1, lat1, lng1) = markers[position - 1], markers[position]
+                ratio = (address.km - km0) / (km1 - km0)
+                distance = min(address.km - km0, km1 - address.km)
+                factor = max(0.0, 1 - distance / KM_CONFIDENCE_RANGE)
+                return lat0 + ratio * (lat1 - lat0), lng0 + ratio * (lng1 - lng0), factor
+            # Fora do trecho conhecido: marco mais próximo, com o dobro da penalidade
+            _, lat, lng = markers[0] if position == 0 else markers[-1]
+            distance = abs(kms[0 if position == 0 else -1] - address.km)
+            return lat, lng, max(0.0, 1 - 2 * distance / KM_CONFIDENCE_RANGE)
+
+        if address.number is None:
+            _, _, lat, lng = min(points, key=lambda point: point[1] or 0)
+            return lat, lng, NEAREST_NUMBER_FACTOR
+
+        known = sorted((number, lat, lng) for km, number, lat, lng in points if km is None and number is not None)
+        if not known:
+            _, _, lat, lng = points[0]
+            return lat, lng, MISSING_NUMBER_FACTOR
+        numbers = [point[0] for point in known]
+        position = bisect_left(numbers, address.number)
+        if position < len(numbers) and numbers[position] == address.number:
+            return known[position][1], known[position][2], 1.0
+        if 0 < position < len(numbers):
+            # Entre dois números conhecidos: interpola, com confiança menor quanto maior a distância
+            (number0, lat0, lng0), (number1, lat1, lng1) = known[position - 1], known[position]
+            ratio = (address.number - number0) / (number1 - number0)
+            distance = min(address.number - number0, number1 - address.number)
+            factor = NEAREST_NUMBER_FACTOR * max(0.0, 1 - distance / NUMBER_CONFIDENCE_RANGE)
+            return lat0 + ratio * (lat1 - lat0), lng0 + ratio * (lng1 - lng0), factor
+        # Fora do trecho conhecido: número mais próximo, com o dobro da penalidade
+        _, lat, lng = known[0] if position == 0 else known[-1]
+        distance = abs(numbers[0 if position == 0 else -1] - address.number)
+        return lat, lng, NEAREST_NUMBER_FACTOR * max(0.0, 1 - 2 * distance / NUMBER_CONFIDENCE_RANGE)
+
+    def match(self, text):
+        """
+        Procura um endereço no índice.
+
+        Parâmetros:
+            text (str): Endereço livre (ex.: "BR-101 KM-383 UF-RJ -RIO DE JANEIRO").
+
+        Retorna:
+            Match: lat, lng, confidence (0 a 1) e o lugar encontrado, ou None.
+        """
+        address = parse_address(text)
+        if not address.street:
+            return None
+
+        with self._lock:
+            resolved = {}
+            query_weight = 0.0
+            for token in address.street:
+                vocabulary, similarity = self._resolve(token)
+                query_weight += self._weight(vocabulary or token)
+                if vocabulary:
+                    resolved[vocabulary] = max(similarity, resolved.get(vocabulary, 0.0))
+
+            best_score, best_key = 0.0, None
+            exact = {token for token, similarity in resolved.items() if similarity == 1.0}
+            for key in set().union(*(self._index[token] for token in resolved)):
+                street, city = key
+                shared = sum(self._weight(token) * similarity for token, similarity in resolved.items() if token in street)
+                street_weight = sum(self._weight(token) for token in street)
+                # Os dois lados precisam estar cobertos: um lugar contido na consulta
+                # ("rua") não vale para "RUA DAS FLORES", e vice-versa
+                score = min(shared / street_weight, shared / query_weight)
+                names = [token for token in street if token not in STREET_TYPES]
+                if names and not exact.intersection(names):
+                    # "BRASILIA" parecido com "brasil" não basta para dispensar a API
+                    score = min(score, FUZZY_ONLY_CONFIDENCE)
+                if city and address.city and city != address.city:
+                    score *= CITY_MISMATCH_FACTOR
+                if score > best_score:
+                    best_score, best_key = score, key
+            if best_key is None:
+                return None
+            lat, lng, factor = self._locate(self._places[best_key], address)
+
+        street, city = best_key
+        name = " ".join(street) + (f" - {city}" if city else "")
+        return Match(lat, lng, round(best_score * factor, 3), name)
+
+
+def import_csv(store, path):
+    """
+    Importa uma tabela de logradouros/marcos quilométricos para o gazetteer.
+
+    O CSV (separado por vírgula ou ponto e vírgula) deve ter as colunas
+    logradouro, latitude e longitude, e opcionalmente km. Uma nova importação
+    do mesmo arquivo substitui a anterior.
+
+    Parâmetros:
+        store (CoordinateStore): Cache persistente onde as entradas são gravadas.
+        path (str): Caminho do CSV.
+
+    Retorna:
+        int: Quantidade de linhas importadas.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        dialect = csv.Sniffer().sniff(file.readline(), delimiters=",;")
+        file.seek(0)
+        rows = []
+        for line in csv.DictReader(file, dialect=dialect):
+            try:
+                km = (line.get("km") or "").strip()
+                rows.append((
+                    line["logradouro"].strip(),
+                    float(km.replace(",", ".")) if km else None,
+                    float(line["latitude"].replace(",", ".")),
+                    float(line["longitude"].replace(",", ".")),
+                ))
+            except (KeyError, ValueError, AttributeError) as e:
+                print(f"Linha ignorada em {path}: {line} ({e})")
+    store.replace_gazetteer(rows, os.path.basename(path))
+    return len(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    from coordinate_store import CoordinateStore, DB_FILE
+
+    parser = argparse.ArgumentParser(description="Gazetteer local de endereços.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    importer = subparsers.add_parser("import", help="Importa um CSV de logradouros/marcos quilométricos.")
+    importer.add_argument("csv", help="Arquivo com as colunas logradouro, km, latitude, longitude.")
+    matcher = subparsers.add_parser("match", help="Procura endereços e mostra a confiança.")
+    matcher.add_argument("addresses", nargs="+", help="Endereços a procurar.")
+    parser.add_argument("--db", default=DB_FILE, help="Arquivo SQLite do cache.")
+    args = parser.parse_args()
+
+    store = CoordinateStore(args.db)
+    if args.command == "import":
+        print(f"{import_csv(store, args.csv)} entradas importadas de {args.csv}.")
+    else:
+        gazetteer = Gazetteer.from_store(store)
+        for text in args.addresses:
+            match = gazetteer.match(text)
+            if match is None:
+                print(f"{text}: sem correspondência")
+            else:
+                status = "ok" if match.confidence >= MIN_CONFIDENCE else "baixa confiança"
+                print(f"{text}: {match.lat:.6f}, {match.lng:.6f} ({match.name}, confiança {match.confidence}, {status})")
@@ -1,45 +1,57 @@
 import os
-import json
 import requests
+import numpy as np
 import streamlit as st
 import time
+import random
+import threading
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from coordinate_store import CoordinateCache, CoordinateStore, DB_FILE, JSON_CACHE_FILE
+from gazetteer import Gazetteer, MIN_CONFIDENCE
+from addresses import canonicalize
 
-CACHE_FILE = "coordinates_cache.json"
-LAST_SAVE_TIME = time.time()
+# Endpoint configurável para permitir testes contra um servidor HTTP local
+GEOCODING_URL = os.environ.get("GEOCODING_URL", "https://api.opencagedata.com/geocode/v1/json")
+GEOCODING_MAX_WORKERS = 8
+GEOCODING_RATE_LIMIT = 8.0  # Requisições por segundo somando todas as threads
+GEOCODING_MAX_RETRIES = 3
+GEOCODING_BACKOFF = 1.0  # Segundos antes da primeira nova tentativa (dobra a cada tentativa)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+AUTH_ERROR_STATUS = {401, 402, 403}  # Chave inválida ou cota esgotada: problema da conta, não do endereço
 
-def initialize_cache():
-    if 'cache' not in st.session_state:
-        st.session_state.cache = load_cache()
+# Tempo (segundos) que cada tipo de falha fica no cache negativo antes de uma nova consulta à API
+NEGATIVE_CACHE_TTL = {
+    "no_result": 30 * 24 * 3600,
+    "http_error": 6 * 3600,
+    "timeout": 30 * 60,
+    "auth_error": 0,  # Não armazenar
+}
 
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r') as file:
-                return json.load(file)
-        except (IOError, json.JSONDecodeError) as e:
-            print(f"Erro ao carregar o cache: {e}")
-    return {}
-
-def initialize_cache():
-    if 'cache' not in st.session_state:
-        st.session_state.cache = load_cache()
-
-initialize_cache()  # Inicializar no carregamento do módulo
+@st.cache_resource
+def get_store(path=DB_FILE, json_path=JSON_CACHE_FILE):
+    """Cache persistente em SQLite, aberto (e migrado do JSON legado) uma vez por processo."""
+    return CoordinateStore(path, json_path)
 
+@st.cache_resource
+def get_cache(path=DB_FILE, json_path=JSON_CACHE_FILE):
+    """Cache em memória único por processo, compartilhado (com lock) por todas as sessões."""
+    return CoordinateCache(get_store(path, json_path))
 
-def save_cache():
-    try:
-        with open(CACHE_FILE, 'w') as file:
-            json.dump(st.session_state.cache, file, indent=4)
-    except IOError as e:
-        print(f"Erro ao salvar o cache: {e}")
+@st.cache_resource
+def get_gazetteer(path=DB_FILE, json_path=JSON_CACHE_FILE):
+    """Gazetteer local montado uma vez por processo e alimentado pelas novas geocodificações."""
+    return Gazetteer.from_store(get_store(path, json_path))
 
-def save_cache_throttled(interval=30):
-    global LAST_SAVE_TIME
-    if time.time() - LAST_SAVE_TIME > interval:
-        save_cache()
-        LAST_SAVE_TIME = time.time()
+def match_offline(keys, min_confidence=MIN_CONFIDENCE):
+    """Resolve pelo gazetteer, sem rede, as chaves com confiança suficiente: {key: (lat, lng)}."""
+    gazetteer = get_gazetteer()
+    resolved = {}
+    for key in keys:
+        match = gazetteer.match(key)
+        if match is not None and match.confidence >= min_confidence:
+            resolved[key] = (match.lat, match.lng)
+    return resolved
 
 def normalize_text(text):
     return ''.join(
@@ -47,35 +59,231 @@ def normalize_text(text):
         if unicodedata.category(c) != 'Mn'
     ).lower().strip()
 
-def get_coordinates(local, api_key, timeout=15):
-    url = f"https://api.opencagedata.com/geocode/v1/json?q={local}&key={api_key}"
+class TokenBucket:
+    """Limitador de taxa compartilhado entre threads (rate tokens por segundo, até capacity acumulados)."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_thread_local = threading.local()
+
+
+def _get_session():
+    """Uma requests.Session por thread, reaproveitando conexões HTTP."""
+    if not hasattr(_thread_local, "session"):
+        _thread_local.session = requests.Session()
+    return _thread_local.session
+
+
+def _is_retryable(error):
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def _failure_reason(error):
+    if isinstance(error, requests.Timeout):
+        return "timeout"
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        if error.response.status_code in AUTH_ERROR_STATUS:
+            return "auth_error"
+    return "http_error"
+
+
+def geocode(local, api_key, timeout=15, base_url=None, rate_limiter=None, max_retries=GEOCODING_MAX_RETRIES):
+    """
+    Consulta a API de geocodificação para um local.
+
+    Retorna:
+        tuple: (lat, lng, reason) onde reason é None em caso de sucesso ou um
+        dos motivos de NEGATIVE_CACHE_TTL em caso de falha.
+    """
+    params = {"q": local, "key": api_key}
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            response = _get_session().get(base_url or GEOCODING_URL, params=params, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+            if 'results' in data and data['results']:
+                geometry = data['results'][0]['geometry']
+                lat, lng = geometry['lat'], geometry['lng']
+                if lat and lng:
+                    return lat, lng, None
+            print(f"Nenhum resultado válido para o local: {local}")
+            return None, None, "no_result"
+        except (requests.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+            # KeyError/IndexError/TypeError: resposta 200 fora do formato esperado (vira "http_error")
+            if attempt < max_retries and _is_retryable(e):
+                # Backoff exponencial com jitter para não sincronizar as threads
+                time.sleep(GEOCODING_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+                continue
+            print(f"Erro ao buscar coordenadas: {e}")
+            return None, None, _failure_reason(e)
+    return None, None, "http_error"
+
+
+def get_coordinates(local, api_key, timeout=15, **options):
+    lat, lng, _ = geocode(local, api_key, timeout=timeout, **options)
+    return lat, lng
+
+
+def geocode_batch(locations, api_key, max_workers=GEOCODING_MAX_WORKERS, rate_limit=GEOCODING_RATE_LIMIT, base_url=None, on_result=None):
+    """
+    Geocodifica vários locais em paralelo respeitando o limite de requisições.
+
+    Em uma interrupção (ex.: KeyboardInterrupt), as consultas que ainda não
+    começaram são canceladas e as que estavam em andamento são aguardadas e
+    repassadas a on_result antes de a exceção seguir adiante.
+
+    Parâmetros:
+        locations (iterable): Locais (já normalizados) a consultar.
+        api_key (str): Chave da API de geocodificação.
+        max_workers (int): Número máximo de requisições simultâneas.
+        rate_limit (float): Requisições por segundo somando todas as threads.
+        base_url (str): Endpoint alternativo (ex.: servidor local de testes).
+        on_result (callable): Chamada como on_result(local, (lat, lng, reason)) a cada consulta concluída.
+
+    Retorna:
+        dict: {local: (lat, lng, reason)}, com reason None para os locais resolvidos.
+    """
+    locations = list(dict.fromkeys(locations))
+    if not locations:
+        return {}
+
+    results = {}
+
+    def collect(local, result):
+        results[local] = result
+        if on_result is not None:
+            on_result(local, result)
+
+    rate_limiter = TokenBucket(rate_limit)
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(locations)))
+    futures = {
+        executor.submit(geocode, local, api_key, base_url=base_url, rate_limiter=rate_limiter): local
+        for local in locations
+    }
     try:
-        response = requests.get(url, timeout=timeout)
-        response.raise_for_status()
-        data = response.json()
-        if 'results' in data and data['results']:
-            geometry = data['results'][0]['geometry']
-            lat, lng = geometry['lat'], geometry['lng']
-            if lat and lng:
-                return lat, lng
-        print(f"Nenhum resultado válido para o local: {local}")
-    except requests.RequestException as e:
-        print(f"Erro ao buscar coordenadas: {e}")
-    return None, None
+        for future in as_completed(futures):
+            collect(futures[future], future.result())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        # Consultas já pagas que terminaram durante a interrupção também são entregues
+        for future, local in futures.items():
+            if local not in results and future.done() and not future.cancelled() and future.exception() is None:
+                collect(local, future.result())
+    return results
+
+
+def canonical_keys(locations):
+    """Chaves do cache de coordenadas de uma lista de locais (None para locais que não são texto)."""
+    return [canonicalize(local) if isinstance(local, str) else None for local in locations]
+
+def lookup_coordinates(locations, api_key, **batch_options):
+    """
+    Retorna as coordenadas de uma lista de locais distintos.
+
+    Cada local é canonicalizado uma única vez (a forma canônica é a chave do
+    cache, de modo que variações do mesmo endereço compartilham a entrada); os
+    que ainda não estão no cache são
+    procurados no gazetteer local e, se não houver correspondência confiável
+    (nem falha registrada no cache negativo), consultados de uma vez com
+    geocode_batch e gravados no cache compartilhado pelas sessões à medida
+    que chegam.
+
+    Parâmetros:
+        locations (array-like): Locais distintos (ex.: uniques de pd.factorize).
+        api_key (str): Chave da API de geocodificação.
+
+    Retorna:
+        ndarray: Matriz (len(locations), 2) com latitude e longitude, NaN quando não resolvido.
+    """
+    cache = get_cache()
+    keys = canonical_keys(locations)
+    known = cache.get_many(keys)
+
+    pending = {key for key in keys if key and key not in known}
+    if pending:
+        offline = match_offline(pending)
+        known.update(offline)
+        pending -= offline.keys()
+    if pending:
+        pending -= cache.get_failures(pending).keys()
+    if pending:
+        # A API recebe o texto original (mais informativo), uma consulta por chave canônica
+        queries = {}
+        for key, local in zip(keys, locations):
+            if key in pending:
+                queries.setdefault(key, normalize_text(local))
+        query_keys = {query: key for key, query in queries.items()}
+
+        def store(query, result):
+            # Cada resultado é gravado ao chegar, para não perder consultas pagas em uma interrupção
+            lat, lng, reason = result
+            if reason is None:
+                cache.put(query_keys[query], lat, lng)
+                get_gazetteer().add(query_keys[query], lat, lng)
+            else:
+                cache.put_failures({query_keys[query]: reason}, NEGATIVE_CACHE_TTL)
+
+        try:
+            results = geocode_batch(queries.values(), api_key, on_result=store, **batch_options)
+        finally:
+            cache.flush()
+        known.update(
+            (query_keys[query], (lat, lng)) for query, (lat, lng, reason) in results.items() if reason is None
+        )
+
+    missing = (np.nan, np.nan)
+    coordinates = [known.get(key, missing) if key else missing for key in keys]
+    return np.array(coordinates, dtype=float).reshape(len(keys), 2)
 
 def get_cached_coordinates(local, api_key):
-    initialize_cache()
-    cache = st.session_state.cache
-    normalized_local = normalize_text(local)
+    cache = get_cache()
+    key = canonicalize(local)
+
+    coordinates = cache.get(key)
+    if coordinates is not None:
+        return coordinates
 
-    if normalized_local in cache:
-        lat, lng = cache[normalized_local]
-        if lat is not None and lng is not None:
-            return lat, lng
+    offline = match_offline([key])
+    if offline:
+        return offline[key]
 
-    lat, lng = get_coordinates(normalized_local, api_key)
-    if lat is not None and lng is not None:
-        cache[normalized_local] = (lat, lng)
-        save_cache_throttled()  # Salvar apenas periodicamente
+    if cache.get_failures([key]):
+        return None, None
+
+    lat, lng, reason = geocode(normalize_text(local), api_key)
+    if reason is None:
+        cache.put(key, lat, lng)
+        get_gazetteer().add(key, lat, lng)
+    else:
+        cache.put_failures({key: reason}, NEGATIVE_CACHE_TTL)
+    cache.flush()  # Uma gravação avulsa não dispara o flush por intervalo
 
     return lat, lng
+
+def purge_failed_lookups(reason=None):
+    """Remove o cache negativo (todo ou de um motivo), para que os locais sejam consultados novamente."""
+    removed = get_store().purge_failures(reason)
+    get_cache().forget_failures(reason)
+    return removed
@@ -1,5 +1,5 @@
-import pandas as pd
 import plotly.express as px
+from schema import ENQUADRAMENTO, DESCRICAO, AUTO_INFRACAO
 
 def create_common_infractions_chart(data):
    """
@@ -11,21 +11,21 @@ def create_common_infractions_chart(data):
    Returns:
        fig (plotly.graph_objects.Figure): A bar chart of the most common infractions.
    """
-   infraction_column = 8  # Índice da coluna 'Enquadramento da Infração'
-   description_column = 11  # Índice da coluna 'Descrição'
-   auto_infraction_column = 5  # Índice da coluna 'Auto de Infração'
+   infraction_column = ENQUADRAMENTO
+   description_column = DESCRICAO
+   auto_infraction_column = AUTO_INFRACAO
 
-   # Verificar se os índices estão presentes no DataFrame
+   # Verificar se as colunas estão presentes no DataFrame
    required_columns = [infraction_column, description_column, auto_infraction_column]
    for col in required_columns:
        if col not in data.columns:
-           raise KeyError(f"A coluna com índice {col} não está presente no DataFrame.")
+           raise KeyError(f"A coluna '{col}' não está presente no DataFrame.")
 
    # Agrupar primeiro por descrição para combinar ocorrências do mesmo tipo
-   infraction_data = (data.groupby([description_column, infraction_column])[auto_infraction_column]
+   infraction_data = (data.groupby([description_column, infraction_column], observed=True)[auto_infraction_column]
                      .count()
                      .reset_index()
-                     .groupby(description_column)
+                     .groupby(description_column, observed=True)
                      .agg({
                          infraction_column: 'first',
                          auto_infraction_column: 'sum'
@@ -40,7 +40,7 @@ def create_common_infractions_chart(data):
 
    # Criar o texto formatado lado a lado
    infraction_data['Texto'] = (
-       infraction_data['Enquadramento'] + " | " +
+       infraction_data['Enquadramento'].astype(str) + " | " +
        infraction_data['Frequência'].astype(str) + " ocorrências"
    )
 
@@ -2,45 +2,20 @@ import pandas as pd
 import plotly.express as px
 import streamlit as st
 from datetime import datetime
-import numpy as np
+from schema import AUTO_INFRACAO, DATA_INFRACAO, VALOR_A_PAGAR
+from parsers import centavos_to_reais
 
 def create_monthly_fines_chart(data):
     """
     Cria gráfico de linhas para multas mensais com seletor de ano.
-    """
-    # Converter coluna de data e remover valores nulos
-    data = data.copy()  # Criar uma cópia para evitar SettingWithCopyWarning
-    
-    # Converter a coluna de data para datetime, tratando diferentes formatos
-    def convert_date(x):
-        if pd.isna(x):
-            return pd.NaT
-        try:
-            # Tentar converter diretamente
-            return pd.to_datetime(x)
-        except:
-            try:
-                # Se for um número inteiro (ano), converter para o primeiro dia do ano
-                if isinstance(x, (int, np.integer)):
-                    return pd.to_datetime(f"{int(x)}-01-01")
-                return pd.NaT
-            except:
-                return pd.NaT
-
-    # Aplicar a conversão de data
-    data[9] = data[9].apply(convert_date)
-    
-    # Filtrar apenas registros que têm multas e datas válidas
-    data = data[data[5].notna() & data[9].notna()]
-    
-    # Remover duplicatas baseado no Auto de Infração
-    data = data.drop_duplicates(subset=[5])
 
-    # Converter valores monetários
-    data[14] = pd.to_numeric(data[14].astype(str).str.replace(r'[^\d,.-]', '', regex=True).str.replace(',', '.'), errors='coerce')
+    Espera as multas já únicas por Auto de Infração (Dataset.unique_fines).
+    """
+    # Filtrar apenas registros que têm multas e datas válidas (datas já normalizadas na ingestão)
+    data = data[data[AUTO_INFRACAO].notna() & data[DATA_INFRACAO].notna()]
 
     # Obter anos disponíveis dos dados
-    anos_disponiveis = sorted(data[9].dt.year.unique())
+    anos_disponiveis = sorted(data[DATA_INFRACAO].dt.year.unique())
     
     if not anos_disponiveis:
         st.warning("Não há dados disponíveis para exibir o gráfico mensal.")
@@ -56,29 +31,30 @@ def create_monthly_fines_chart(data):
         )
 
     # Filtrar dados para o ano selecionado
-    dados_ano = data[data[9].dt.year == ano_selecionado]
+    dados_ano = data[data[DATA_INFRACAO].dt.year == ano_selecionado]
     
     # Criar uma lista com todos os meses do ano
     todos_meses = pd.period_range(start=f"{ano_selecionado}-01", end=f"{ano_selecionado}-12", freq='M')
     
     # Agrupar por mês e calcular as métricas
     dados_mensais = (
-        dados_ano.groupby(dados_ano[9].dt.to_period('M'))
+        dados_ano.groupby(dados_ano[DATA_INFRACAO].dt.to_period('M'))
         .agg({
-            5: 'count',  # Quantidade de multas (contagem de Autos de Infração únicos)
-            14: 'sum'   # Valor total
+            AUTO_INFRACAO: 'count',  # Quantidade de multas (contagem de Autos de Infração únicos)
+            VALOR_A_PAGAR: 'sum'   # Valor total
         })
         .reset_index()
     )
     
     # Ajustar o índice para incluir todos os meses
-    dados_mensais.set_index(9, inplace=True)
+    dados_mensais.set_index(DATA_INFRACAO, inplace=True)
     dados_mensais = dados_mensais.reindex(todos_meses, fill_value=0).reset_index()
     dados_mensais.rename(columns={
         "index": "Mês",
-        5: "Quantidade_de_Multas",
-        14: "Valor_Total"
+        AUTO_INFRACAO: "Quantidade_de_Multas",
+        VALOR_A_PAGAR: "Valor_Total"
     }, inplace=True)
+    dados_mensais["Valor_Total"] = centavos_to_reais(dados_mensais["Valor_Total"])
     
     # Converter o período para datetime para o gráfico
     dados_mensais["Mês"] = dados_mensais["Mês"].dt.strftime('%Y-%m')
@@ -143,41 +119,15 @@ def create_monthly_fines_chart(data):
 def create_yearly_fines_chart(data):
     """
     Cria gráfico de linhas para multas anuais com seletor de período.
+
+    Espera as multas já únicas por Auto de Infração (Dataset.unique_fines).
     """
-    # Converter coluna de data e remover valores nulos
-    data = data.copy()  # Criar uma cópia para evitar SettingWithCopyWarning
-    
-    # Converter a coluna de data para datetime, tratando diferentes formatos
-    def convert_date(x):
-        if pd.isna(x):
-            return pd.NaT
-        try:
-            # Tentar converter diretamente
-            return pd.to_datetime(x)
-        except:
-            try:
-                # Se for um número inteiro (ano), converter para o primeiro dia do ano
-                if isinstance(x, (int, np.integer)):
-                    return pd.to_datetime(f"{int(x)}-01-01")
-                return pd.NaT
-            except:
-                return pd.NaT
-
-    # Aplicar a conversão de data
-    data[9] = data[9].apply(convert_date)
-    
-    # Filtrar apenas registros que têm multas e datas válidas
-    data = data[data[5].notna() & data[9].notna()]
-    
-    # Remover duplicatas baseado no Auto de Infração
-    data = data.drop_duplicates(subset=[5])
+    # Filtrar apenas registros que têm multas e datas válidas (datas já normalizadas na ingestão)
+    data = data[data[AUTO_INFRACAO].notna() & data[DATA_INFRACAO].notna()]
 
-    # Converter valores monetários
-    data[14] = pd.to_numeric(data[14].astype(str).str.replace(r'[^\d,.-]', '', regex=True).str.replace(',', '.'), errors='coerce')
-    
     # Forçar o range de anos de 2017 até o próximo ano
-    min_ano = min(data[9].dt.year.min(), 2017)
-    max_ano = max(data[9].dt.year.max(), datetime.now().year + 1)
+    min_ano = min(data[DATA_INFRACAO].dt.year.min(), 2017)
+    max_ano = max(data[DATA_INFRACAO].dt.year.max(), datetime.now().year + 1)
     anos_disponiveis = list(range(min_ano, max_ano + 1))
     
     if not anos_disponiveis:
@@ -206,21 +156,22 @@ def create_yearly_fines_chart(data):
         )
 
     # Filtrar dados pelo período selecionado
-    mask_periodo = (data[9].dt.year >= ano_inicio) & (data[9].dt.year <= ano_fim)
+    mask_periodo = (data[DATA_INFRACAO].dt.year >= ano_inicio) & (data[DATA_INFRACAO].dt.year <= ano_fim)
     dados_periodo = data[mask_periodo]
 
     # Agrupar por ano e calcular métricas
     dados_anuais = (
-        dados_periodo.groupby(dados_periodo[9].dt.year)
+        dados_periodo.groupby(dados_periodo[DATA_INFRACAO].dt.year)
         .agg({
-            5: 'count',  # Quantidade de multas
-            14: 'sum'    # Valor total
+            AUTO_INFRACAO: 'count',  # Quantidade de multas
+            VALOR_A_PAGAR: 'sum'    # Valor total
         })
         .reset_index()
     )
 
     # Renomear colunas
     dados_anuais.columns = ['Ano', 'Quantidade_de_Multas', 'Valor_Total']
+    dados_anuais['Valor_Total'] = centavos_to_reais(dados_anuais['Valor_Total'])
 
     with col3:
         # Criar o gráfico
@@ -1,60 +1,43 @@
-import pandas as pd
 import plotly.express as px
 from datetime import datetime
+from schema import PLACA, VALOR_A_PAGAR, AUTO_INFRACAO, DATA_INFRACAO
+from parsers import centavos_to_reais
 
 def get_vehicle_fines_data(df):
     """
     Processa os dados para obter veículos com mais multas e seus valores totais.
 
     Parâmetros:
-        df (DataFrame): O conjunto de dados contendo informações sobre multas.
+        df (DataFrame): O conjunto de dados contendo informações sobre multas,
+            já único por Auto de Infração (Dataset.unique_fines).
 
     Retorna:
         DataFrame: Um DataFrame com os dados agregados por veículo.
     """
-    # Índices corretos das colunas
-    plate_column = 1  # Índice da coluna 'Placa Relacionada'
-    value_column = 14  # Índice da coluna 'Valor a ser pago R$'
-    infraction_column = 5  # Índice da coluna 'Auto de Infração'
-    date_column = 9  # Índice da coluna 'Data da Infração'
+    # Colunas utilizadas
+    plate_column = PLACA
+    value_column = VALOR_A_PAGAR
+    infraction_column = AUTO_INFRACAO
+    date_column = DATA_INFRACAO
 
     # Verificar colunas essenciais
     required_columns = [plate_column, value_column, infraction_column, date_column]
     for col in required_columns:
         if col not in df.columns:
-            raise KeyError(f"A coluna com índice {col} não está presente no DataFrame.")
-
-    # Copiar o DataFrame
-    df = df.copy()
+            raise KeyError(f"A coluna '{col}' não está presente no DataFrame.")
 
-    # Converter 'Data da Infração' para datetime e filtrar apenas o ano atual
-    df[date_column] = pd.to_datetime(df[date_column], errors='coerce', dayfirst=True)
+    # Filtrar apenas o ano atual
     df = df[df[date_column].dt.year == datetime.now().year]
 
-    # Garantir que 'Valor a ser pago R$' esteja no formato numérico
-    try:
-        df[value_column] = (
-            df[value_column]
-            .astype(str)
-            .str.replace(r'[^\d,.-]', '', regex=True)  # Remove caracteres não numéricos
-            .str.replace(',', '.')
-            .astype(float)
-            .fillna(0)
-        )
-    except ValueError as e:
-        raise ValueError(f"Erro ao converter valores monetários: {e}")
-
-    # Remover duplicatas baseadas no 'Auto de Infração' (registro único de multa)
-    df = df.drop_duplicates(subset=[infraction_column])
-
     # Remover registros com placas nulas ou inválidas
     df = df.dropna(subset=[plate_column])
 
     # Agrupar os dados por 'Placa Relacionada'
-    fines_by_vehicle = df.groupby(plate_column).agg(
+    fines_by_vehicle = df.groupby(plate_column, observed=True).agg(
         total_fines=(value_column, 'sum'),
         num_fines=(infraction_column, 'nunique')  # Contar apenas multas únicas
     ).reset_index()
+    fines_by_vehicle['total_fines'] = centavos_to_reais(fines_by_vehicle['total_fines'])
 
     # Renomear as colunas para facilitar a leitura no gráfico
     fines_by_vehicle.rename(columns={
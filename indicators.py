@@ -1,52 +1,33 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from schema import (
+    DIA_CONSULTA, PLACA, AUTO_INFRACAO, ENQUADRAMENTO, DATA_INFRACAO, DESCRICAO,
+    LOCAL_INFRACAO, VALOR_ORIGINAL, VALOR_A_PAGAR, STATUS_PAGAMENTO, ORGAO_EMISSOR
+)
+from parsers import centavos_to_reais
 
 def handle_details_display(df, columns_to_display, rename_map=None, title="Detalhamento dos Dados"):
     """Função auxiliar para exibir dados em um expander estilizado com colunas contextuais"""
     
-    # Mapeamento expandido das colunas
-    full_column_map = {
-        0: "Dia da Consulta",
-        1: "Placa do Veículo",
-        2: "RENAVAM",
-        3: "CNPJ",
-        4: "Status",
-        5: "Auto de Infração",
-        6: "Auto de Renainf",
-        7: "Data para Pagto c/ Desconto",
-        8: "Enquadramento",
-        9: "Data da Infração",
-        10: "Hora",
-        11: "Descrição",
-        12: "Local da Infração",
-        13: "Valor Original",
-        14: "Valor a Pagar",
-        15: "Status de Pagamento",
-        16: "Órgão Emissor",
-        17: "Agente Emissor"
-    }
-    
     # Define colunas contextuais baseado no título
     if "Total de Multas" in title:
-        columns_to_display = [0, 1, 5, 8, 11, 12, 14, 15]  # Visão geral completa
+        columns_to_display = [DIA_CONSULTA, PLACA, AUTO_INFRACAO, ENQUADRAMENTO, DESCRICAO, LOCAL_INFRACAO, VALOR_A_PAGAR, STATUS_PAGAMENTO]  # Visão geral completa
     elif "Valor Total" in title:
-        columns_to_display = [0, 1, 5, 13, 14, 15, 16]  # Foco em valores e pagamentos
+        columns_to_display = [DIA_CONSULTA, PLACA, AUTO_INFRACAO, VALOR_ORIGINAL, VALOR_A_PAGAR, STATUS_PAGAMENTO, ORGAO_EMISSOR]  # Foco em valores e pagamentos
     elif "Ano" in title:
-        columns_to_display = [0, 1, 5, 8, 11, 14, 15, 16]  # Visão anual com detalhes
+        columns_to_display = [DIA_CONSULTA, PLACA, AUTO_INFRACAO, ENQUADRAMENTO, DESCRICAO, VALOR_A_PAGAR, STATUS_PAGAMENTO, ORGAO_EMISSOR]  # Visão anual com detalhes
     elif "Mês" in title:
-        columns_to_display = [0, 1, 5, 8, 11, 12, 14, 15, 16]  # Visão mensal detalhada
+        columns_to_display = [DIA_CONSULTA, PLACA, AUTO_INFRACAO, ENQUADRAMENTO, DESCRICAO, LOCAL_INFRACAO, VALOR_A_PAGAR, STATUS_PAGAMENTO, ORGAO_EMISSOR]  # Visão mensal detalhada
     
     display_df = df[columns_to_display].copy()
-    rename_map = {col: full_column_map[col] for col in columns_to_display}
-    display_df = display_df.rename(columns=rename_map)
 
     # Formatação de valores monetários e datas
     for col in display_df.columns:
         if "Valor" in col:
-            display_df[col] = display_df[col].apply(lambda x: f'R$ {x:,.2f}')
-        elif "Data" in col:
-            display_df[col] = pd.to_datetime(display_df[col], format='%d/%m/%Y', dayfirst=True).dt.strftime('%d/%m/%Y')
+            display_df[col] = centavos_to_reais(display_df[col]).apply(lambda x: f'R$ {x:,.2f}')
+        elif pd.api.types.is_datetime64_any_dtype(display_df[col]):
+            display_df[col] = display_df[col].dt.strftime('%d/%m/%Y')
 
     st.markdown("""
         <style>
@@ -237,19 +218,14 @@ def render_css():
         </style>
     """, unsafe_allow_html=True)
 
-def render_indicators(data, filtered_data, data_inicio, data_fim):
+def render_indicators(data, filtered_data, data_inicio, data_fim, raw_data=None):
     render_css()
 
-    if 5 not in data.columns:
-        st.error("A coluna com índice 5 não foi encontrada nos dados.")
+    if AUTO_INFRACAO not in data.columns:
+        st.error(f"A coluna '{AUTO_INFRACAO}' não foi encontrada nos dados.")
         return
 
-    column_map = {
-        0: "Data",
-        1: "Placa do Veículo",
-        5: "Auto de Infração",
-        14: "Valor"
-    }
+    default_columns = [DIA_CONSULTA, PLACA, AUTO_INFRACAO, VALOR_A_PAGAR]
 
     try:
         # Verificação de datas nulas
@@ -257,30 +233,32 @@ def render_indicators(data, filtered_data, data_inicio, data_fim):
             data_inicio = datetime.now().replace(day=1)
             data_fim = datetime.now()
 
-        # Cria DataFrame com valores únicos por auto de infração
-        unique_fines = data.drop_duplicates(subset=[5])
-        unique_filtered_data = filtered_data.drop_duplicates(subset=[5])
+        # Os dados já chegam únicos por auto de infração (Dataset.unique_fines)
+        unique_fines = data
+        unique_filtered_data = filtered_data
         
         # Cálculos com valores únicos
-        total_multas = unique_fines[5].nunique()
-        valor_total_multas = unique_fines[14].sum()
+        total_multas = unique_fines[AUTO_INFRACAO].nunique()
+        valor_total_multas = centavos_to_reais(unique_fines[VALOR_A_PAGAR].sum())
         ano_atual = datetime.now().year
         mes_atual = data_fim.month if data_fim else datetime.now().month
 
         # Filtragem para ano atual (valores únicos)
-        multas_ano_atual = unique_fines[unique_fines[9].dt.year == ano_atual][5].nunique()
-        valor_multas_ano_atual = unique_fines[unique_fines[9].dt.year == ano_atual][14].sum()
+        multas_ano_atual = unique_fines[unique_fines[DATA_INFRACAO].dt.year == ano_atual][AUTO_INFRACAO].nunique()
+        valor_multas_ano_atual = centavos_to_reais(unique_fines[unique_fines[DATA_INFRACAO].dt.year == ano_atual][VALOR_A_PAGAR].sum())
 
         # Filtragem para mês atual (valores únicos)
         mes_data = unique_filtered_data[
-            (unique_filtered_data[9].dt.year == ano_atual) & 
-            (unique_filtered_data[9].dt.month == mes_atual)
+            (unique_filtered_data[DATA_INFRACAO].dt.year == ano_atual) & 
+            (unique_filtered_data[DATA_INFRACAO].dt.month == mes_atual)
         ]
-        multas_mes_atual = mes_data[5].nunique()
-        valor_multas_mes_atual = mes_data[14].sum()
+        multas_mes_atual = mes_data[AUTO_INFRACAO].nunique()
+        valor_multas_mes_atual = centavos_to_reais(mes_data[VALOR_A_PAGAR].sum())
 
-        # Data da última atualização
-        data_atualizacao = data.iloc[0, 0] if not data.empty else pd.Timestamp.now()
+        # Data da última atualização: todas as consultas da planilha (raw_data), não apenas
+        # as que resultaram em multas únicas
+        consultas = data if raw_data is None else raw_data
+        data_atualizacao = consultas[DIA_CONSULTA].max() if not consultas.empty else pd.Timestamp.now()
         if isinstance(data_atualizacao, str):
             data_atualizacao = pd.to_datetime(data_atualizacao, format='%d/%m/%Y', dayfirst=True)
                 
@@ -299,8 +277,8 @@ def render_indicators(data, filtered_data, data_inicio, data_fim):
             if st.button("🔍 Detalhes", key="total_multas"):
                 handle_details_display(
                     unique_fines,
-                    [0, 1, 5, 14],
-                    column_map,
+                    default_columns,
+                    None,
                     "Total de Multas"
                 )
 
@@ -316,8 +294,8 @@ def render_indicators(data, filtered_data, data_inicio, data_fim):
             if st.button("🔍 Detalhes", key="valor_total"):
                 handle_details_display(
                     unique_fines,
-                    [0, 1, 5, 14],
-                    column_map,
+                    default_columns,
+                    None,
                     "Valor Total das Multas"
                 )
 
@@ -331,11 +309,11 @@ def render_indicators(data, filtered_data, data_inicio, data_fim):
                 unsafe_allow_html=True
             )
             if st.button("🔍 Detalhes", key="multas_ano"):
-                ano_data = unique_fines[unique_fines[9].dt.year == ano_atual]
+                ano_data = unique_fines[unique_fines[DATA_INFRACAO].dt.year == ano_atual]
                 handle_details_display(
                     ano_data,
-                    [0, 1, 5, 14],
-                    column_map,
+                    default_columns,
+                    None,
                     f"Multas do Ano {ano_atual}"
                 )
 
@@ -349,11 +327,11 @@ def render_indicators(data, filtered_data, data_inicio, data_fim):
                 unsafe_allow_html=True
             )
             if st.button("🔍 Detalhes", key="valor_ano"):
-                ano_data = unique_fines[unique_fines[9].dt.year == ano_atual]
+                ano_data = unique_fines[unique_fines[DATA_INFRACAO].dt.year == ano_atual]
                 handle_details_display(
                     ano_data,
-                    [0, 1, 5, 14],
-                    column_map,
+                    default_columns,
+                    None,
                     f"Valor das Multas do Ano {ano_atual}"
                 )
 
@@ -369,8 +347,8 @@ def render_indicators(data, filtered_data, data_inicio, data_fim):
             if st.button("🔍 Detalhes", key="multas_mes"):
                 handle_details_display(
                     mes_data,
-                    [0, 1, 5, 14],
-                    column_map,
+                    default_columns,
+                    None,
                     f"Multas do Mês {mes_atual:02d}/{ano_atual}"
                 )
 
@@ -386,8 +364,8 @@ def render_indicators(data, filtered_data, data_inicio, data_fim):
             if st.button("🔍 Detalhes", key="valor_mes"):
                 handle_details_display(
                     mes_data,
-                    [0, 1, 5, 14],
-                    column_map,
+                    default_columns,
+                    None,
                     f"Valor das Multas do Mês {mes_atual:02d}/{ano_atual}"
                 )
 
@@ -404,8 +382,8 @@ def render_indicators(data, filtered_data, data_inicio, data_fim):
             if st.button("🔍 Detalhes", key="ultima_atualizacao"):
                 handle_details_display(
                     unique_fines,
-                    [0, 1, 5, 14],
-                    column_map,
+                    default_columns,
+                    None,
                     "Última Atualização"
                 )
 
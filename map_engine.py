@@ -0,0 +1,555 @@
+import re
+import json
+import folium
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+from folium.map import Layer
+from folium.plugins import FastMarkerCluster, HeatMap, MarkerCluster
+from folium.template import Template
+from folium.utilities import remove_empty
+from streamlit_folium import st_folium
+from spatial_index import GridIndex, haversine_m
+from schema import LOCAL_INFRACAO, VALOR_A_PAGAR, DATA_INFRACAO
+from parsers import centavos_to_reais
+
+DEFAULT_CENTER = [-22.9068, -43.1729]  # Rio de Janeiro, quando não há coordenadas
+ICON_URL = "https://cdn-icons-png.flaticon.com/512/1828/1828843.png"
+ICON_SIZE = (30, 30)
+
+# Camadas disponíveis e pesos do mapa de calor (chave: rótulo exibido)
+MAP_MODES = {"markers": "Marcadores", "heatmap": "Mapa de calor", "viewport": "Área visível"}
+HEATMAP_WEIGHTS = {"count": "Quantidade de multas", "value": "Valor a pagar"}
+HEATMAP_GRID = 200  # Células no maior lado da área; a saída tem no máximo HEATMAP_GRID² células
+HEATMAP_MIN_CELL = 0.001  # Tamanho mínimo da célula em graus (cerca de 100 m)
+HEATMAP_CACHE_ENTRIES = 16  # Estados de filtro com a grade guardada
+HEATMAP_OPTIONS = {"min_opacity": 0.3, "max_zoom": 18, "radius": 20, "blur": 15}  # Opções do L.heatLayer
+SUMMARY_CACHE_ENTRIES = 8  # Resumos por localização guardados (estados de filtro)
+VIEWPORT_MAX_MARKERS = 300  # Acima disso a área visível é mostrada em células agregadas
+VIEWPORT_MIN_ZOOM = 10  # Abaixo desse zoom a área visível é sempre agregada
+VIEWPORT_MARGIN = 0.25  # Fração da altura/largura acrescentada em cada lado da área visível
+VIEWPORT_GRID = 16  # Células no maior lado da área visível quando agregada
+
+# Cada marcador é criado no navegador a partir de uma linha compacta:
+# [lat, lng, quantidade de multas, id da localização]. O popup traz apenas o id;
+# os detalhes são formatados no servidor quando o marcador é clicado.
+MARKER_CALLBACK = """
+function (row) {
+    var icon = L.icon({iconUrl: %s, iconSize: [%d, %d]});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon, fines: row[2]});
+    marker.bindPopup(
+        '<b>' + row[2] + ' multa(s)</b> · local #' + row[3] + '<br>Detalhes abaixo do mapa',
+        {maxWidth: 300}
+    );
+    return marker;
+}
+""" % (json.dumps(ICON_URL), ICON_SIZE[0], ICON_SIZE[1])
+POPUP_TEMPLATE = "<b>{count} multa(s)</b> · local #{location_id}<br>Detalhes abaixo do mapa"
+POPUP_ID_PATTERN = re.compile(r"local #(\d+)")
+
+# Os grupos mostram o total de multas dos marcadores agrupados, não o número de locais
+CLUSTER_ICON = """
+function (cluster) {
+    var total = 0;
+    cluster.getAllChildMarkers().forEach(function (marker) { total += marker.options.fines; });
+    var size = total < 10 ? 'small' : (total < 100 ? 'medium' : 'large');
+    return L.divIcon({
+        html: '<div><span>' + total + '</span></div>',
+        className: 'marker-cluster marker-cluster-' + size,
+        iconSize: new L.Point(40, 40)
+    });
+}
+"""
+
+
+def aggregate_by_location(data):
+    """
+    Agrega as multas por coordenada distinta.
+
+    Parâmetros:
+        data (DataFrame): Multas com as colunas Latitude e Longitude.
+
+    Retorna:
+        DataFrame: Uma linha por coordenada, com Local, Quantidade, Valor_Total
+        (centavos), Primeira_Data e Ultima_Data.
+    """
+    located = data.dropna(subset=['Latitude', 'Longitude'])
+    return (
+        located.groupby(['Latitude', 'Longitude'], sort=False)
+        .agg(
+            Local=(LOCAL_INFRACAO, 'first'),
+            Quantidade=(LOCAL_INFRACAO, 'size'),
+            Valor_Total=(VALOR_A_PAGAR, 'sum'),
+            Primeira_Data=(DATA_INFRACAO, 'min'),
+            Ultima_Data=(DATA_INFRACAO, 'max'),
+        )
+        .reset_index()
+    )
+
+
+def _format_period(first, last):
+    if pd.isna(first):
+        return "Não disponível"
+    first, last = first.strftime('%d/%m/%Y'), last.strftime('%d/%m/%Y')
+    return first if first == last else f"{first} a {last}"
+
+
+def _marker_rows(locations):
+    """Converte as localizações agregadas nas linhas compactas lidas por MARKER_CALLBACK."""
+    return [
+        [round(lat, 6), round(lng, 6), int(count), int(location_id)]
+        for location_id, lat, lng, count in zip(
+            locations.index, locations['Latitude'], locations['Longitude'], locations['Quantidade']
+        )
+    ]
+
+
+class LocationSummary:
+    """
+    Resumo indexado das multas por localização, para os popups sob demanda.
+
+    Os marcadores levam apenas o id da localização (posição em locations);
+    local, valor e período são formatados só para a localização clicada, e as
+    multas dela são obtidas sem percorrer os dados de novo.
+
+    Parâmetros:
+        data (DataFrame): Multas com Latitude e Longitude.
+    """
+
+    def __init__(self, data):
+        self.locations = aggregate_by_location(data)
+        self.index = GridIndex(self.locations['Latitude'], self.locations['Longitude'])
+
+        # Mesma numeração do groupby de aggregate_by_location (ordem de aparição)
+        groups = data.groupby(['Latitude', 'Longitude'], sort=False).ngroup().to_numpy()
+        positions = np.flatnonzero(groups >= 0)
+        order = np.argsort(groups[positions], kind="stable")
+        self._positions = positions[order]
+        self._starts = np.searchsorted(groups[self._positions], np.arange(len(self.locations) + 1))
+
+    def __len__(self):
+        return len(self.locations)
+
+    def rows(self, location_id):
+        """Posições (iloc), nos dados originais, das multas de uma localização."""
+        return self._positions[self._starts[location_id]:self._starts[location_id + 1]]
+
+    def details(self, location_id):
+        """Campos formatados do popup de uma localização (Local, Multas, Valor Total, Período)."""
+        location = self.locations.iloc[location_id]
+        value = centavos_to_reais(self.locations['Valor_Total'].iloc[[location_id]]).iloc[0]
+        return {
+            "Local": location['Local'],
+            "Multas": int(location['Quantidade']),
+            "Valor Total": f"R$ {value:,.2f}" if pd.notna(value) else "Não disponível",
+            "Período": _format_period(location['Primeira_Data'], location['Ultima_Data']),
+        }
+
+    def fine_rows(self, location_ids):
+        """Posições (iloc), em ordem crescente, das multas de várias localizações."""
+        if len(location_ids) == 0:
+            return np.array([], dtype=np.int64)
+        return np.sort(np.concatenate([self.rows(location_id) for location_id in location_ids]))
+
+    def find_clicked(self, click_data, tolerance_m):
+        """
+        Identifica as localizações clicadas no retorno do st_folium.
+
+        São todas as localizações a até tolerance_m metros do clique, da mais
+        próxima para a mais distante; a do popup clicado, quando corresponde
+        a uma delas, vem primeiro (camadas sem popup e dados alterados usam
+        apenas a distância).
+
+        Retorna:
+            list: ids das localizações (vazia se nenhuma estiver na tolerância).
+        """
+        clicked = (click_data or {}).get("last_object_clicked") or {}
+        lat, lng = clicked.get("lat"), clicked.get("lng")
+        if lat is None or lng is None:
+            return []
+
+        nearby = self.index.within(lat, lng, tolerance_m)
+        distances = haversine_m(
+            lat, lng, self.locations['Latitude'].to_numpy()[nearby], self.locations['Longitude'].to_numpy()[nearby]
+        )
+        location_ids = [int(location_id) for location_id in nearby[np.argsort(distances, kind="stable")]]
+
+        text = click_data.get("last_object_clicked_popup") or click_data.get("last_object_clicked_tooltip") or ""
+        found = POPUP_ID_PATTERN.search(text)
+        if found and int(found.group(1)) in location_ids:
+            location_ids.remove(int(found.group(1)))
+            location_ids.insert(0, int(found.group(1)))
+        return location_ids
+
+
+@st.cache_resource(max_entries=SUMMARY_CACHE_ENTRIES, show_spinner=False)
+def get_location_summary(fingerprint, _data):
+    """LocationSummary compartilhado entre execuções enquanto a impressão digital dos dados for a mesma."""
+    return LocationSummary(_data)
+
+
+# Camada do mapa já serializada: apenas números e strings (nenhum objeto folium),
+# para ser guardada em cache e montada em um mapa novo a cada execução.
+# mode: "markers" ou "heatmap"; data_json: linhas da camada em JSON (None sem
+# pontos); bounds: [[sul, oeste], [norte, leste]] ou None.
+MapPayload = namedtuple("MapPayload", ["mode", "center", "data_json", "bounds"])
+
+
+class SerializedMarkerCluster(FastMarkerCluster):
+    """FastMarkerCluster com as linhas já em JSON, sem validar e serializar os pontos a cada execução."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                {{ this.callback }}
+
+                var data = {{ this.data_json }};
+                var cluster = L.markerClusterGroup({{ this.options|tojavascript }});
+                {%- if this.icon_create_function is not none %}
+                cluster.options.iconCreateFunction =
+                    {{ this.icon_create_function.strip() }};
+                {%- endif %}
+
+                for (var i = 0; i < data.length; i++) {
+                    var row = data[i];
+                    var marker = callback(row);
+                    marker.addTo(cluster);
+                }
+
+                cluster.addTo({{ this._parent.get_name() }});
+                return cluster;
+            })();
+        {% endmacro %}"""
+    )
+
+    def __init__(self, data_json, callback, icon_create_function=None):
+        MarkerCluster.__init__(self, icon_create_function=icon_create_function)
+        self._name = "FastMarkerCluster"
+        self.data_json = data_json
+        self.callback = f"var callback = {callback};"
+
+
+class SerializedHeatMap(HeatMap):
+    """HeatMap com as células já em JSON e os limites calculados de antemão."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.heatLayer(
+                {{ this.data_json }},
+                {{ this.options|tojavascript }}
+            );
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, data_json, bounds, **options):
+        Layer.__init__(self)
+        self._name = "HeatMap"
+        self.data_json = data_json
+        self.bounds = bounds
+        self.options = remove_empty(**options)
+
+    def _get_self_bounds(self):
+        return self.bounds
+
+
+def fines_payload(locations):
+    """
+    Camada de marcadores agrupados no navegador, serializada.
+
+    O tamanho depende do número de localizações distintas, não do número de
+    multas: cada localização vira uma linha compacta (com o id da localização
+    no lugar do popup formatado) e os marcadores são montados pelo
+    FastMarkerCluster no cliente.
+
+    Parâmetros:
+        locations (DataFrame): Resultado de aggregate_by_location.
+
+    Retorna:
+        MapPayload: Camada "markers".
+    """
+    if locations.empty:
+        return MapPayload("markers", DEFAULT_CENTER, None, None)
+    center = [float(locations['Latitude'].mean()), float(locations['Longitude'].mean())]
+    return MapPayload("markers", center, json.dumps(_marker_rows(locations)), None)
+
+
+def build_fines_map(locations, zoom_start=8, tiles="CartoDB dark_matter"):
+    """Cria o mapa de multas com agrupamento de marcadores no navegador (ver fines_payload)."""
+    return render_map(fines_payload(locations), zoom_start, tiles)
+
+
+def bin_coordinates(latitudes, longitudes, weights=None, grid=HEATMAP_GRID):
+    """
+    Agrega coordenadas em células quadradas de uma grade regular.
+
+    O tamanho da célula acompanha a extensão dos pontos, de modo que a saída
+    tem no máximo grid² células, qualquer que seja o número de pontos.
+
+    Parâmetros:
+        latitudes (array-like): Latitudes (NaN são ignorados).
+        longitudes (array-like): Longitudes na mesma ordem.
+        weights (array-like): Peso de cada ponto (1 para cada, se None).
+        grid (int): Número de células no maior lado da área.
+
+    Retorna:
+        DataFrame: Latitude e Longitude do centro de cada célula ocupada e Peso somado.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    weights = np.ones(len(latitudes)) if weights is None else np.asarray(weights, dtype=float)
+    valid = np.isfinite(latitudes) & np.isfinite(longitudes) & np.isfinite(weights)
+    latitudes, longitudes, weights = latitudes[valid], longitudes[valid], weights[valid]
+    if len(latitudes) == 0:
+        return pd.DataFrame({"Latitude": [], "Longitude": [], "Peso": []})
+
+    south, west = latitudes.min(), longitudes.min()
+    extent = max(latitudes.max() - south, longitudes.max() - west)
+    cell_size = max(extent / grid, HEATMAP_MIN_CELL)
+    rows = np.minimum(((latitudes - south) / cell_size).astype(np.int64), grid - 1)
+    columns = np.minimum(((longitudes - west) / cell_size).astype(np.int64), grid - 1)
+
+    cells, inverse = np.unique(rows * grid + columns, return_inverse=True)
+    return pd.DataFrame({
+        "Latitude": south + (cells // grid + 0.5) * cell_size,
+        "Longitude": west + (cells % grid + 0.5) * cell_size,
+        "Peso": np.bincount(inverse, weights=weights, minlength=len(cells)),
+    })
+
+
+def heatmap_weights(data, weight):
+    """Pesos por multa para o mapa de calor: None (contagem) ou Valor a Pagar em reais."""
+    if weight == "value":
+        return centavos_to_reais(data[VALOR_A_PAGAR]).fillna(0).to_numpy()
+    return None
+
+
+def heatmap_bins(data, weight):
+    """Grade do mapa de calor das multas (ver bin_coordinates), com o peso escolhido."""
+    return bin_coordinates(
+        data['Latitude'].to_numpy(dtype=float),
+        data['Longitude'].to_numpy(dtype=float),
+        heatmap_weights(data, weight),
+    )
+
+
+@st.cache_data(max_entries=HEATMAP_CACHE_ENTRIES, show_spinner=False)
+def cached_bins(fingerprint, weight, _data):
+    """
+    heatmap_bins com cache: o mesmo estado de filtros não é agregado de novo.
+
+    A chave é a impressão digital dos dados filtrados, não os dados: o
+    Streamlit calcula o hash de arrays grandes a partir de uma amostra (dois
+    conjuntos de pontos do mesmo tamanho poderiam colidir), e percorrê-los a
+    cada execução custaria tanto quanto agregá-los.
+    """
+    return heatmap_bins(_data, weight)
+
+
+def heatmap_payload(bins):
+    """
+    Camada do mapa de calor a partir das células agregadas no servidor, serializada.
+
+    Parâmetros:
+        bins (DataFrame): Resultado de bin_coordinates.
+
+    Retorna:
+        MapPayload: Camada "heatmap" (pesos normalizados entre 0 e 1).
+    """
+    if bins.empty:
+        return MapPayload("heatmap", DEFAULT_CENTER, None, None)
+
+    center = [float(bins['Latitude'].mean()), float(bins['Longitude'].mean())]
+    peak = bins['Peso'].max()
+    cells = np.column_stack([
+        bins['Latitude'].round(5),
+        bins['Longitude'].round(5),
+        (bins['Peso'] / peak if peak > 0 else bins['Peso']).round(4),
+    ])
+    bounds = [
+        [float(cells[:, 0].min()), float(cells[:, 1].min())],
+        [float(cells[:, 0].max()), float(cells[:, 1].max())],
+    ]
+    return MapPayload("heatmap", center, json.dumps(cells.tolist()), bounds)
+
+
+def build_heatmap(bins, zoom_start=8, tiles="CartoDB dark_matter"):
+    """Cria o mapa de calor a partir das células agregadas no servidor (ver heatmap_payload)."""
+    return render_map(heatmap_payload(bins), zoom_start, tiles)
+
+
+def map_payload(data, mode="markers", weight="count", summary=None, fingerprint=None):
+    """
+    Camada do mapa de multas no modo escolhido, serializada (ver MapPayload).
+
+    O resultado não contém objetos folium e pode ser guardado em cache por
+    estado de filtros e camada: render_map monta um mapa novo a partir dele a
+    cada execução, sem agregar nem serializar os pontos de novo.
+
+    Parâmetros:
+        data (DataFrame): Multas com Latitude e Longitude.
+        mode (str): "markers" (marcadores agrupados) ou "heatmap" (grade no servidor).
+        weight (str): Peso do mapa de calor, "count" ou "value".
+        summary (LocationSummary): Resumo já calculado dos dados, se houver.
+        fingerprint (str): Impressão digital dos dados; com ela, a grade do mapa de calor fica em cache.
+
+    Retorna:
+        MapPayload: A camada pronta para render_map.
+    """
+    if mode == "heatmap":
+        if fingerprint is None:
+            bins = heatmap_bins(data, weight)
+        else:
+            bins = cached_bins(fingerprint, weight, data)
+        return heatmap_payload(bins)
+    locations = summary.locations if summary is not None else aggregate_by_location(data)
+    return fines_payload(locations)
+
+
+def render_map(payload, zoom_start=8, tiles="CartoDB dark_matter"):
+    """
+    Monta um folium.Map novo a partir de uma camada serializada.
+
+    Objetos folium não devem ser reaproveitados entre chamadas do st_folium,
+    que os altera ao renderizar; mapas montados com a mesma camada geram o
+    mesmo conteúdo, e o componente não é recriado.
+
+    Parâmetros:
+        payload (MapPayload): Resultado de map_payload (ou fines_payload/heatmap_payload).
+        zoom_start (int): Zoom inicial.
+        tiles (str): Camada base do mapa.
+
+    Retorna:
+        folium.Map: O mapa pronto para st_folium.
+    """
+    map_object = folium.Map(location=payload.center, zoom_start=zoom_start, tiles=tiles)
+    if payload.data_json is None:
+        return map_object
+    if payload.mode == "heatmap":
+        SerializedHeatMap(payload.data_json, payload.bounds, **HEATMAP_OPTIONS).add_to(map_object)
+    else:
+        SerializedMarkerCluster(payload.data_json, MARKER_CALLBACK, CLUSTER_ICON).add_to(map_object)
+    return map_object
+
+
+def build_map(data, mode="markers", weight="count", zoom_start=8, summary=None, fingerprint=None):
+    """
+    Monta o mapa de multas na camada escolhida (map_payload + render_map).
+
+    Parâmetros:
+        data (DataFrame): Multas com Latitude e Longitude.
+        mode (str): "markers" (marcadores agrupados) ou "heatmap" (grade no servidor).
+        weight (str): Peso do mapa de calor, "count" ou "value".
+        zoom_start (int): Zoom inicial.
+        summary (LocationSummary): Resumo já calculado dos dados, se houver.
+        fingerprint (str): Impressão digital dos dados; com ela, a grade do mapa de calor fica em cache.
+
+    Retorna:
+        folium.Map: O mapa pronto para st_folium.
+    """
+    return render_map(map_payload(data, mode, weight, summary, fingerprint), zoom_start)
+
+
+class ViewportMap:
+    """
+    Mapa com apenas os marcadores da área visível.
+
+    O mapa base depende apenas do resumo e é criado a cada execução (objetos
+    folium não são reaproveitados entre chamadas do st_folium); os marcadores
+    da área informada pelo st_folium na última interação, com uma margem, são
+    enviados como camada dinâmica (feature_group_to_add), sem recriar o
+    componente. Com zoom afastado ou marcadores demais, a área é mostrada em
+    células agregadas. Em ambos os casos o número de elementos enviados é
+    limitado, qualquer que seja o tamanho dos dados.
+
+    Parâmetros:
+        summary (LocationSummary): Resumo das multas por localização.
+        zoom_start (int): Zoom inicial.
+        tiles (str): Camada base do mapa.
+    """
+
+    def __init__(self, summary, zoom_start=8, tiles="CartoDB dark_matter"):
+        self.locations = summary.locations
+        self.index = summary.index
+        if self.locations.empty:
+            center = DEFAULT_CENTER
+        else:
+            center = [self.locations['Latitude'].mean(), self.locations['Longitude'].mean()]
+        self.zoom_start = zoom_start
+        self.map = folium.Map(location=center, zoom_start=zoom_start, tiles=tiles)
+
+    def visible(self, bounds):
+        """Localizações dentro de bounds ({"_southWest": {...}, "_northEast": {...}}) mais a margem."""
+        try:
+            south, west = bounds["_southWest"]["lat"], bounds["_southWest"]["lng"]
+            north, east = bounds["_northEast"]["lat"], bounds["_northEast"]["lng"]
+        except (KeyError, TypeError):
+            return self.locations
+        if None in (south, west, north, east):
+            return self.locations
+        margin_lat = (north - south) * VIEWPORT_MARGIN
+        margin_lng = (east - west) * VIEWPORT_MARGIN
+        positions = self.index.within_bounds(
+            south - margin_lat, west - margin_lng, north + margin_lat, east + margin_lng
+        )
+        return self.locations.iloc[positions]
+
+    def layer(self, view=None):
+        """
+        Monta a camada da área visível.
+
+        Parâmetros:
+            view (dict): Último retorno do st_folium (usa "bounds" e "zoom"); None no primeiro carregamento.
+
+        Retorna:
+            folium.FeatureGroup: Marcadores individuais ou células agregadas.
+        """
+        view = view or {}
+        visible = self.visible(view.get("bounds"))
+        zoom = view.get("zoom") or self.zoom_start
+        group = folium.FeatureGroup(name="Multas")
+
+        if zoom >= VIEWPORT_MIN_ZOOM and len(visible) <= VIEWPORT_MAX_MARKERS:
+            for lat, lng, count, location_id in _marker_rows(visible):
+                # O st_folium não normaliza o id aleatório do conteúdo do popup; um id
+                # fixo por localização mantém a camada igual enquanto a área não muda
+                content = folium.Html(POPUP_TEMPLATE.format(count=count, location_id=location_id), script=True)
+                content._id = f"local_{location_id}"
+                folium.Marker(
+                    location=[lat, lng],
+                    popup=folium.Popup(content, max_width=300),
+                    icon=folium.CustomIcon(ICON_URL, icon_size=ICON_SIZE),
+                ).add_to(group)
+            return group
+
+        cells = bin_coordinates(visible['Latitude'], visible['Longitude'], visible['Quantidade'], grid=VIEWPORT_GRID)
+        peak = cells['Peso'].max() if not cells.empty else 1
+        for lat, lng, fines in zip(cells['Latitude'], cells['Longitude'], cells['Peso']):
+            folium.CircleMarker(
+                location=[lat, lng],
+                radius=6 + 18 * (fines / peak) ** 0.5,
+                color="#F37529",
+                fill=True,
+                fill_opacity=0.6,
+                tooltip=f"{int(fines)} multas (aproxime para ver os locais)",
+            ).add_to(group)
+        return group
+
+    def display(self, key, **kwargs):
+        """
+        Exibe o mapa com a camada da área visível da última interação.
+
+        Deve ser chamado uma única vez por objeto: o st_folium anexa a camada
+        ao mapa, então cada execução cria um ViewportMap novo.
+
+        Parâmetros:
+            key (str): Chave do st_folium; o retorno da última interação fica em st.session_state[key].
+
+        Retorna:
+            dict: O retorno do st_folium.
+        """
+        layer = self.layer(st.session_state.get(key))
+        return st_folium(self.map, key=key, feature_group_to_add=layer, **kwargs)
@@ -0,0 +1,157 @@
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Valores exportados com ponto decimal ("195.23"), sem vírgula
+DECIMAL_POINT_PATTERN = r"^-?\d+\.\d{1,2}$"
+# Número já normalizado para ponto decimal, validado antes do cast
+NUMBER_PATTERN = r"^-?\d+(\.\d+)?$"
+
+
+def _parse_text_centavos(text):
+    """Converte uma Series de strings para centavos (Int64), NA quando o texto não é um valor."""
+    clean = pa.array(text.astype("string[pyarrow]"))
+    clean = pc.replace_substring_regex(clean, r"R\$|\s|\)", "")
+    clean = pc.replace_substring(clean, "(", "-")  # "(10,00)" representa valor negativo
+    clean = pc.replace_substring(clean, "--", "-")
+
+    # Formato brasileiro: ponto como milhar e vírgula como decimal
+    brl = pc.replace_substring(pc.replace_substring(clean, ".", ""), ",", ".")
+    clean = pc.if_else(pc.match_substring_regex(clean, DECIMAL_POINT_PATTERN), clean, brl)
+
+    valid = pc.match_substring_regex(clean, NUMBER_PATTERN)
+    reais = pc.cast(pc.if_else(valid, clean, None), pa.float64())
+    centavos = pc.round(pc.multiply(reais, 100))
+    return pd.Series(centavos.to_numpy(zero_copy_only=False), index=text.index).astype("Int64")
+
+
+def parse_brl_to_centavos(series):
+    """
+    Converte valores monetários em reais para centavos inteiros (Int64).
+
+    Aceita números já lidos pelo Excel, textos no formato brasileiro com ou sem
+    "R$", separador de milhar, sinal negativo ou parênteses e valores com ponto
+    decimal. Vazios e textos inválidos viram NA. O parsing é feito apenas sobre
+    os valores distintos e propagado para as linhas com um take indexado.
+
+    Parâmetros:
+        series (Series): Coluna de valores monetários.
+
+    Retorna:
+        Series: Valores em centavos, dtype Int64, com o mesmo índice da entrada.
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return (series.astype("float64") * 100).round().astype("Int64")
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+    is_text = np.fromiter((isinstance(value, str) for value in uniques), dtype=bool, count=len(uniques))
+
+    parsed = pd.Series(pd.NA, index=uniques.index, dtype="Int64")
+    if is_text.any():
+        parsed[is_text] = _parse_text_centavos(uniques[is_text].astype("string"))
+    if (~is_text).any():
+        numbers = pd.to_numeric(uniques[~is_text], errors="coerce")
+        parsed[~is_text] = (numbers * 100).round().astype("Int64")
+
+    # Código -1 (valor nulo) aponta para uma posição extra com NA
+    parsed = pd.concat([parsed, pd.Series([pd.NA], dtype="Int64")], ignore_index=True)
+    values = parsed.to_numpy(dtype="float64", na_value=np.nan).take(codes)
+    return pd.Series(values, index=series.index, name=series.name).round().astype("Int64")
+
+
+def centavos_to_reais(values):
+    """Converte centavos (Series ou escalar) para reais em ponto flutuante, para exibição e gráficos."""
+    if isinstance(values, pd.Series):
+        return values.astype("float64") / 100
+    return float(values) / 100 if pd.notna(values) else 0.0
+
+
+# Formatos testados em ordem; o primeiro é o da planilha do DETRAN
+DATE_FORMATS = [
+    "%d/%m/%Y",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y %H:%M:%S",
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%d-%m-%Y",
+]
+EXCEL_EPOCH = "1899-12-30"
+MIN_YEAR, MAX_YEAR = 1900, 2100
+
+
+def _dates_from_numbers(numbers):
+    """Converte números em datas: anos isolados (ex.: 2023) ou números seriais do Excel."""
+    numbers = pd.to_numeric(numbers, errors="coerce").astype("float64")
+    result = pd.Series(pd.NaT, index=numbers.index, dtype="datetime64[ns]")
+
+    is_year = (numbers >= MIN_YEAR) & (numbers <= MAX_YEAR) & (numbers % 1 == 0)
+    if is_year.any():
+        result[is_year] = pd.to_datetime(numbers[is_year].astype("int64").astype(str), format="%Y")
+
+    # Seriais do Excel até 31/12/9999
+    is_serial = ~is_year & (numbers >= 1) & (numbers < 2958466)
+    if is_serial.any():
+        result[is_serial] = pd.to_datetime(numbers[is_serial], unit="D", origin=EXCEL_EPOCH).dt.floor("s")
+    return result
+
+
+def _dates_from_text(text):
+    """Converte strings testando DATE_FORMATS em ordem, apenas nas linhas ainda não resolvidas."""
+    text = text.str.strip()
+    result = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    pending = text.notna() & (text != "")
+    for date_format in DATE_FORMATS:
+        if not pending.any():
+            break
+        parsed = pd.to_datetime(text[pending], format=date_format, errors="coerce")
+        result[pending] = parsed
+        pending &= result.isna()
+
+    # Textos numéricos ("2023", "45123")
+    if pending.any():
+        result[pending] = _dates_from_numbers(text[pending])
+    return result
+
+
+def parse_dates(series):
+    """
+    Normaliza uma coluna de datas em datetime64[ns] de forma vetorizada.
+
+    Usa o formato %d/%m/%Y como caminho rápido e tenta os demais formatos de
+    DATE_FORMATS apenas nas linhas que falharam. Datas já convertidas pelo
+    Excel são mantidas, números são tratados como ano isolado (1900-2100) ou
+    serial do Excel, e valores inválidos viram NaT. Cada valor distinto é
+    convertido uma única vez.
+
+    Parâmetros:
+        series (Series): Coluna com datas em texto, números ou datetime.
+
+    Retorna:
+        Series: Datas em datetime64[ns], com o mesmo índice da entrada.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("datetime64[ns]")
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return _dates_from_numbers(series)
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+    kinds = uniques.map(type)
+    is_text = kinds.map(lambda kind: issubclass(kind, str)).to_numpy(dtype=bool)
+    is_date = kinds.map(lambda kind: issubclass(kind, (datetime, date, np.datetime64))).to_numpy(dtype=bool)
+    is_number = ~is_text & ~is_date
+
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype="datetime64[ns]")
+    if is_text.any():
+        parsed[is_text] = _dates_from_text(uniques[is_text].astype("string"))
+    if is_date.any():
+        parsed[is_date] = pd.to_datetime(uniques[is_date], errors="coerce")
+    if is_number.any():
+        parsed[is_number] = _dates_from_numbers(uniques[is_number])
+
+    # Código -1 (valor nulo) aponta para uma posição extra com NaT
+    values = np.append(parsed.to_numpy(), np.datetime64("NaT", "ns")).take(codes)
+    return pd.Series(values, index=series.index, name=series.name)
@@ -0,0 +1,115 @@
+"""
+Pré-aquecimento do cache de coordenadas, sem abrir o dashboard.
+
+Lê a planilha (arquivo local ou ID do Drive), extrai os endereços distintos
+de "Local da Infração" e resolve os que ainda não estão no cache com a mesma
+lógica do app (gazetteer, cache negativo e geocodificação em paralelo). Cada
+resultado é gravado assim que chega, então uma execução interrompida pode ser
+retomada: os endereços já resolvidos são pulados.
+
+Uso:
+    python prewarm.py planilha_baixada.xlsx
+    python prewarm.py <drive_file_id> --credentials credenciais.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import streamlit as st
+from addresses import canonicalize
+from data_pipeline import load_data_from_drive, preprocess_data
+from geo_utils import GEOCODING_MAX_WORKERS, GEOCODING_RATE_LIMIT, get_cache, lookup_coordinates
+from schema import LOCAL_INFRACAO
+
+CHUNK_SIZE = 200  # Endereços por bloco (um relatório de progresso por bloco)
+
+
+def load_locations(source, credentials_info=None):
+    """
+    Retorna os endereços distintos da planilha.
+
+    Parâmetros:
+        source (str): Caminho de um arquivo .xlsx ou ID do arquivo no Drive.
+        credentials_info (dict): Credenciais da conta de serviço (apenas para o Drive).
+
+    Retorna:
+        list: Endereços distintos, na ordem em que aparecem.
+    """
+    if os.path.exists(source):
+        data = preprocess_data(source)
+    else:
+        data = load_data_from_drive(source, credentials_info).data
+    return list(data[LOCAL_INFRACAO].dropna().unique())
+
+
+def prewarm(locations, api_key, chunk_size=CHUNK_SIZE, **batch_options):
+    """
+    Resolve e grava no cache as coordenadas de todos os endereços, em blocos.
+
+    Parâmetros:
+        locations (list): Endereços distintos.
+        api_key (str): Chave da API de geocodificação.
+        chunk_size (int): Endereços por bloco; o progresso é exibido ao fim de cada bloco.
+
+    Retorna:
+        dict: Contagens de endereços já em cache, resolvidos e não resolvidos.
+    """
+    cached = set(get_cache().get_many({canonicalize(local) for local in locations}))
+    pending = [local for local in locations if canonicalize(local) not in cached]
+    print(f"{len(locations)} endereços distintos, {len(locations) - len(pending)} já em cache.")
+
+    resolved = unresolved = 0
+    started = time.monotonic()
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        coordinates = lookup_coordinates(chunk, api_key, **batch_options)
+        found = int(np.isfinite(coordinates).all(axis=1).sum())
+        resolved += found
+        unresolved += len(chunk) - found
+        print(
+            f"{start + len(chunk)}/{len(pending)} processados "
+            f"({resolved} resolvidos, {unresolved} sem coordenadas, {time.monotonic() - started:.1f}s)"
+        )
+
+    return {"cached": len(locations) - len(pending), "resolved": resolved, "unresolved": unresolved}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-aquece o cache de coordenadas a partir da planilha.")
+    parser.add_argument("source", help="Arquivo .xlsx local ou ID do arquivo no Google Drive.")
+    parser.add_argument("--credentials", help="JSON da conta de serviço (padrão: secrets do Streamlit).")
+    parser.add_argument("--api-key", help="Chave da API de geocodificação (padrão: secrets do Streamlit).")
+    parser.add_argument("--workers", type=int, default=GEOCODING_MAX_WORKERS, help="Requisições simultâneas.")
+    parser.add_argument("--rate-limit", type=float, default=GEOCODING_RATE_LIMIT, help="Requisições por segundo.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Endereços por bloco de progresso.")
+    args = parser.parse_args(argv)
+
+    api_key = args.api_key or st.secrets["general"]["API_KEY"]
+    credentials_info = None
+    if not os.path.exists(args.source):
+        if args.credentials:
+            with open(args.credentials) as file:
+                credentials_info = json.load(file)
+        else:
+            credentials_info = json.loads(st.secrets["general"]["CREDENTIALS"])
+
+    locations = load_locations(args.source, credentials_info)
+    try:
+        result = prewarm(
+            locations, api_key, args.chunk_size, max_workers=args.workers, rate_limit=args.rate_limit
+        )
+    except KeyboardInterrupt:
+        print("Interrompido; os endereços já resolvidos foram gravados e serão pulados na próxima execução.")
+        return 130
+
+    print(
+        f"Concluído: {result['cached']} já em cache, {result['resolved']} resolvidos, "
+        f"{result['unresolved']} sem coordenadas."
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
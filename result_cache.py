@@ -0,0 +1,110 @@
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Limite de memória dos resultados guardados
+
+
+def fingerprint(*parts):
+    """Impressão digital estável das partes que definem um resultado (revisão, filtros, camada...)."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def estimate_size(value):
+    """Estimativa, em bytes, da memória ocupada por um resultado (incluindo o conteúdo das strings)."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Cache LRU de resultados por chave, limitado pela memória estimada.
+
+    Compartilhado entre as sessões: os valores retornados não devem ser
+    alterados. Os resultados mais antigos são descartados quando o total
+    passa de max_bytes; resultados maiores que o limite não são guardados.
+
+    Parâmetros:
+        max_bytes (int): Memória máxima dos resultados guardados.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (valor, tamanho)
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Retorna o resultado de key, chamando compute() apenas se ele não estiver guardado.
+
+        Parâmetros:
+            key (hashable): Chave do resultado (ex.: (fingerprint, "nome da seção")).
+            compute (callable): Função sem argumentos que calcula o resultado.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return value
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+        return value
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """Contadores do cache: entradas, bytes, acertos, faltas e taxa de acerto."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate(),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+@st.cache_resource
+def get_result_cache():
+    """Cache de resultados compartilhado por todas as sessões do processo."""
+    return ResultCache()
@@ -1,92 +1,142 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
+import html
 from datetime import datetime
-import io
 import plotly.express as px
-from folium import Map, Marker, Popup
-from folium.features import CustomIcon
 from streamlit_folium import st_folium
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 
 # Import custom modules
-from graph_geo_distribution import create_geo_distribution_map
-from geo_utils import get_cached_coordinates, initialize_cache
-from graph_vehicles_fines import create_vehicle_fines_chart 
+from geo_utils import canonical_keys, get_cache, lookup_coordinates
 from graph_common_infractions import create_common_infractions_chart
-from graph_weekday_infractions import create_weekday_infractions_chart
 from graph_fines_accumulated import create_monthly_fines_chart, create_yearly_fines_chart
 from indicators import render_indicators
 from filters_module import apply_filters
+from data_pipeline import load_data_from_drive
+from parsers import centavos_to_reais
+from map_engine import (
+    MAP_MODES, HEATMAP_WEIGHTS, ViewportMap, get_location_summary, map_payload, render_map
+)
+from result_cache import fingerprint, get_result_cache
+from schema import (
+    PLACA, AUTO_INFRACAO, ENQUADRAMENTO, DATA_INFRACAO, DESCRICAO, LOCAL_INFRACAO, VALOR_A_PAGAR
+)
+
+CLICK_TOLERANCE_METERS = 30  # Distância máxima entre o clique e a localização exibida
 
-# Inicializar cache
-initialize_cache()
-
-def download_file_from_drive(file_id, credentials_info):
-    credentials = Credentials.from_service_account_info(credentials_info)
-    drive_service = build('drive', 'v3', credentials=credentials)
-    request = drive_service.files().get_media(fileId=file_id)
-    file_buffer = io.BytesIO()
-    downloader = MediaIoBaseDownload(file_buffer, request)
-
-    done = False
-    while not done:
-        _, done = downloader.next_chunk()
-
-    file_buffer.seek(0)
-    return file_buffer
-
-def preprocess_data(file_buffer):
-    data = pd.read_excel(file_buffer)
-    data.columns = range(len(data.columns))
-    
-    # Valores monetários (valor_original e valor_pagar)
-    for col_index in [13, 14]:  # Correto, mantém
-        data[col_index] = (
-            data[col_index]
-            .astype(str)
-            .str.replace('.', '', regex=False)
-            .str.replace(',', '.', regex=False)
-            .astype(float)
+def resolve_coordinates(data, api_key):
+    """
+    Latitude e longitude de cada multa, na ordem das linhas.
+
+    Retorna apenas as coordenadas (array n x 2, NaN quando não resolvidas, somente
+    leitura), de modo que o cache de resultados não guarde uma cópia das multas.
+    """
+    if LOCAL_INFRACAO not in data.columns:
+        st.error(f"A coluna '{LOCAL_INFRACAO}' não foi encontrada.")
+        coordinates = np.full((len(data), 2), np.nan)
+    else:
+        # Consultar cada local distinto uma única vez (locais ausentes do cache são geocodificados em lote)
+        codes, locations = pd.factorize(data[LOCAL_INFRACAO])
+        coordinates = lookup_coordinates(locations, api_key)
+        # Propagar para as linhas com um take indexado; código -1 (local nulo) aponta para a linha NaN extra
+        coordinates = np.vstack([coordinates, [np.nan, np.nan]]).take(codes, axis=0)
+    coordinates.setflags(write=False)
+    return coordinates
+
+
+def location_keys(data):
+    """Chaves do cache de coordenadas dos locais distintos das multas (vazia sem a coluna de local)."""
+    if LOCAL_INFRACAO not in data.columns:
+        return ()
+    return tuple(key for key in canonical_keys(data[LOCAL_INFRACAO].dropna().unique()) if key)
+
+
+def summarize_vehicles(data):
+    """Total de multas e valor total (R$) por placa, em ordem decrescente de valor."""
+    # Agrupar multas (já únicas por Auto de Infração) por placa e calcular o total de multas e o valor total
+    vehicle_summary = (
+        data.groupby(PLACA, observed=True)
+        .agg(
+            Numero_de_Multas=(AUTO_INFRACAO, 'count'),  # Contar multas únicas
+            Valor_Total=(VALOR_A_PAGAR, 'sum')         # Somar o valor das multas
         )
-    
-    # Data da infração
-    data[9] = pd.to_datetime(data[9], errors='coerce', dayfirst=True)
-    
-    return data
-
-def ensure_coordinates(data, api_key):
-    def get_coordinates_with_cache(location):
-        lat, lng = get_cached_coordinates(location, api_key)
-        if lat is None or lng is None:
-            return [float('nan'), float('nan')]
-        return [lat, lng]
-
-    if data.empty:
-        st.warning("Nenhum dado disponível para processar coordenadas.")
-        return data  # Retorna o DataFrame vazio sem erro
-
-    if 12 not in data.columns:
-        st.error("A coluna de Local da Infração (índice 12) não foi encontrada.")
-        data[['Latitude', 'Longitude']] = float('nan')
-        return data
-
-    coordinates = data[12].apply(
-        lambda loc: pd.Series(
-            get_coordinates_with_cache(loc) if pd.notnull(loc) else [float('nan'), float('nan')]
+        .reset_index()
+    )
+    vehicle_summary['Valor_Total'] = centavos_to_reais(vehicle_summary['Valor_Total'])
+
+    # Ordenar os dados pelo valor total em ordem decrescente
+    return vehicle_summary.sort_values(by='Valor_Total', ascending=False)
+
+
+def summarize_weekdays(data):
+    """Quantidade de multas por dia da semana, de segunda a domingo."""
+    # Mapear os nomes dos dias da semana para português manualmente
+    day_translation = {
+        "Monday": "Segunda-feira",
+        "Tuesday": "Terça-feira",
+        "Wednesday": "Quarta-feira",
+        "Thursday": "Quinta-feira",
+        "Friday": "Sexta-feira",
+        "Saturday": "Sábado",
+        "Sunday": "Domingo",
+    }
+
+    # Agrupar por dia da semana
+    weekday_summary = (
+        data[DATA_INFRACAO]
+        .dt.day_name()  # Obter o nome dos dias em inglês
+        .map(day_translation)  # Traduzir os nomes para português
+        .value_counts()
+        .reindex(
+            ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"],
+            fill_value=0  # Garantir que todos os dias apareçam, mesmo sem registros
         )
     )
 
-    # Garantir que sempre haja duas colunas, mesmo que vazias
-    if coordinates.shape[1] != 2:
-        coordinates = pd.DataFrame([[float('nan'), float('nan')]] * len(data), columns=[0, 1])
+    # Converter para DataFrame para uso no gráfico
+    weekday_summary_df = weekday_summary.reset_index()
+    weekday_summary_df.columns = ['Dia da Semana', 'Quantidade de Multas']
+    return weekday_summary_df
+
 
-    # Atribuir as coordenadas corretamente
-    data[['Latitude', 'Longitude']] = coordinates
+def summarize_months(data):
+    """Quantidade e valor total (R$) de multas por mês, incluindo os meses sem multas."""
+    # Encontrar o ano mais antigo e mais recente nos dados
+    min_year = data[DATA_INFRACAO].dt.year.min()
+    max_year = data[DATA_INFRACAO].dt.year.max()
 
-    return data
+    if pd.isna(min_year):
+        min_year = datetime.now().year
+    if pd.isna(max_year):
+        max_year = datetime.now().year
+
+    # Criar uma lista de todos os meses do período
+    all_months = pd.period_range(
+        start=f"{min_year}-01",
+        end=f"{max_year}-12",
+        freq="M"
+    )
+
+    # Agrupar os dados por mês e calcular os totais
+    accumulated_summary = (
+        data.groupby(data[DATA_INFRACAO].dt.to_period("M"))
+        .agg(
+            Quantidade_de_Multas=(AUTO_INFRACAO, 'count'),  # Contar Auto de Infração únicos
+            Valor_Total=(VALOR_A_PAGAR, 'sum')             # Somar os valores das multas
+        )
+        .reset_index()
+    )
+
+    # Ajustar o índice para incluir todos os meses do período
+    accumulated_summary.set_index(DATA_INFRACAO, inplace=True)
+    accumulated_summary = accumulated_summary.reindex(all_months, fill_value=0).reset_index()
+    accumulated_summary.rename(columns={"index": "Período"}, inplace=True)
+    accumulated_summary["Valor_Total"] = centavos_to_reais(accumulated_summary["Valor_Total"])
+
+    # Converter o período para formato de data para o gráfico
+    accumulated_summary["Período"] = accumulated_summary["Período"].dt.to_timestamp()
+    return accumulated_summary
 
 try:
     drive_credentials = json.loads(st.secrets["general"]["CREDENTIALS"])
@@ -215,26 +265,45 @@ st.markdown(
 )
 
 # Carregar e processar dados
-file_buffer = download_file_from_drive(drive_file_id, drive_credentials)
-data = preprocess_data(file_buffer)
+# Carregar o snapshot da revisão atual (download e leitura do XLSX apenas quando a planilha mudar)
+try:
+    dataset = load_data_from_drive(drive_file_id, drive_credentials)
+except ValueError as e:
+    st.error(f"Erro ao carregar a planilha: {e}")
+    st.stop()
 
-if data.empty:
+if dataset.data.empty:
     st.error("Os dados carregados estão vazios.")
     st.stop()
 
+# Todas as seções trabalham sobre as multas únicas (um registro por Auto de Infração),
+# calculadas uma única vez por revisão
+data = dataset.unique_fines
+
 # Aplicar filtros
-filtered_data = apply_filters(data)
+filtered_data, active_filters = apply_filters(data, dataset.filter_index)
 
 # Verificar se há dados após filtragem
 if filtered_data.empty:
     st.warning("Nenhuma multa encontrada com os filtros selecionados. Tente ajustar os filtros.")
     st.stop()
 
-# Garantir coordenadas com cache
-filtered_data = ensure_coordinates(filtered_data, api_key)
+# Resultados por estado dos filtros (revisão + filtros ativos), compartilhados entre as sessões:
+# voltar a uma combinação de filtros já vista reaproveita as coordenadas e os agrupamentos
+results = get_result_cache()
+state_key = fingerprint(dataset.revision, active_filters)
+
+# Garantir coordenadas com cache (recalculadas só quando algum dos locais destes filtros recebe coordenadas;
+# geocodificações de outros endereços, em qualquer sessão, não invalidam o resultado)
+keys = results.get_or_compute((state_key, "chaves"), lambda: location_keys(filtered_data))
+coordinates = results.get_or_compute(
+    (state_key, "coordenadas", get_cache().version(keys)), lambda: resolve_coordinates(filtered_data, api_key)
+)
+# assign não altera os dados filtrados, que podem ser os próprios dados compartilhados da revisão
+filtered_data = filtered_data.assign(Latitude=coordinates[:, 0], Longitude=coordinates[:, 1])
 
 # Renderizar Indicadores
-render_indicators(data, filtered_data, None, None)
+render_indicators(data, filtered_data, None, None, raw_data=dataset.data)
 
 st.markdown(
     """
@@ -254,49 +323,42 @@ st.markdown(
 )
 
 
-# Configurar local inicial do mapa com base nas coordenadas médias das multas
-if not filtered_data.empty and 'Latitude' in filtered_data.columns and 'Longitude' in filtered_data.columns:
-    avg_lat = filtered_data['Latitude'].mean()
-    avg_lon = filtered_data['Longitude'].mean()
-else:
-    avg_lat, avg_lon = -23.5505, -46.6333  # Coordenadas padrão (São Paulo)
-
-m = Map(location=[avg_lat, avg_lon], zoom_start=8, tiles="CartoDB dark_matter")
-
-# Ícone personalizado
-icon_url = "https://cdn-icons-png.flaticon.com/512/1828/1828843.png"
-icon_size = (30, 30)
-
-# Adicionar marcadores ao mapa
-for _, row in filtered_data.iterrows():
-    if pd.notnull(row['Latitude']) and pd.notnull(row['Longitude']):
-        popup_content = f"""
-        <b>Local:</b> {row[12]}<br>
-        <b>Valor:</b> R$ {row[14]:,.2f}<br>
-        <b>Data da Infração:</b> {row[9].strftime('%d/%m/%Y') if pd.notnull(row[9]) else "Não disponível"}
-        """
-        marker_icon = CustomIcon(icon_url, icon_size=icon_size)
-        Marker(
-            location=[row['Latitude'], row['Longitude']],
-            popup=Popup(popup_content, max_width=300),
-            icon=marker_icon
-        ).add_to(m)
+# Marcadores agrupados por coordenada distinta ou mapa de calor agregado no servidor
+col_modo, col_peso = st.columns([2, 2])
+with col_modo:
+    map_mode = st.radio(
+        "Visualização", options=list(MAP_MODES), format_func=MAP_MODES.get, horizontal=True
+    )
+with col_peso:
+    heatmap_weight = st.radio(
+        "Peso do mapa de calor",
+        options=list(HEATMAP_WEIGHTS),
+        format_func=HEATMAP_WEIGHTS.get,
+        horizontal=True,
+        disabled=map_mode != "heatmap",
+    )
 
-# Detalhes das multas para localização selecionada
-map_click_data = st_folium(m, width="100%", height=1000)  # Captura os cliques no mapa
+# Reaproveitar o resumo por localização e a camada serializada do mapa enquanto
+# revisão, filtros, coordenadas resolvidas (e camada) forem os mesmos; o
+# folium.Map em si é montado de novo a cada execução
+data_key = fingerprint(state_key, int(filtered_data['Latitude'].notna().sum()))
+location_summary = get_location_summary(data_key, filtered_data)
+# Detalhes das multas para localização selecionada (captura os cliques no mapa)
+if map_mode == "viewport":
+    # Apenas os marcadores da área visível, a partir dos limites e do zoom da última interação
+    map_click_data = ViewportMap(location_summary).display("mapa_multas", width="100%", height=1000)
+else:
+    weight = heatmap_weight if map_mode == "heatmap" else None
+    payload = results.get_or_compute(
+        (data_key, "mapa", map_mode, weight),
+        lambda: map_payload(filtered_data, map_mode, heatmap_weight, summary=location_summary, fingerprint=data_key),
+    )
+    map_click_data = st_folium(render_map(payload), width="100%", height=1000)
 
 if map_click_data and map_click_data.get("last_object_clicked"):
-    lat = map_click_data["last_object_clicked"].get("lat")
-    lng = map_click_data["last_object_clicked"].get("lng")
-    
-    # Filtrar multas pela localização clicada
-    selected_fines = filtered_data[
-        (filtered_data['Latitude'] == lat) & 
-        (filtered_data['Longitude'] == lng)
-    ]
-
-    # Remover duplicatas baseado no Auto de Infração (índice 5)
-    selected_fines = selected_fines.drop_duplicates(subset=[5])
+    # O popup traz apenas o id da localização; os detalhes são formatados aqui, só para o clique
+    location_ids = location_summary.find_clicked(map_click_data, CLICK_TOLERANCE_METERS)
+    selected_fines = filtered_data.iloc[location_summary.fine_rows(location_ids)]
 
     if not selected_fines.empty:
         st.markdown(
@@ -315,16 +377,21 @@ if map_click_data and map_click_data.get("last_object_clicked"):
             """, 
             unsafe_allow_html=True
         )
+        # Uma ficha por localização dentro da tolerância do clique, da mais próxima para a mais distante
+        for location_id in location_ids:
+            st.markdown("<br>".join(
+                f"<b>{field}:</b> {html.escape(str(value))}"
+                for field, value in location_summary.details(location_id).items()
+            ), unsafe_allow_html=True)
 
         # Exibir detalhes das multas no DataFrame
         st.dataframe(
-            selected_fines[[1, 12, 14, 9, 11]].rename(
+            selected_fines[[PLACA, LOCAL_INFRACAO, VALOR_A_PAGAR, DATA_INFRACAO, DESCRICAO]]
+            .assign(**{VALOR_A_PAGAR: centavos_to_reais(selected_fines[VALOR_A_PAGAR])})
+            .rename(
                 columns={
-                    1: 'Placa Relacionada',
-                    12: 'Local da Infração',
-                    14: 'Valor a ser pago R$',
-                    9: 'Data da Infração',
-                    11: 'Descrição'
+                    PLACA: 'Placa Relacionada',
+                    VALOR_A_PAGAR: 'Valor a ser pago R$'
                 }
             ).reset_index(drop=True),
             use_container_width=True,
@@ -353,22 +420,7 @@ st.markdown(
 )
 
 
-# Filtrar apenas multas únicas com base no índice 5 (Auto de Infração)
-unique_fines = filtered_data.drop_duplicates(subset=[5])
-
-# Agrupar multas por placa (índice 1) e calcular o total de multas e o valor total
-vehicle_summary = (
-    unique_fines.groupby(1)
-    .agg(
-        Numero_de_Multas=(5, 'count'),  # Contar multas únicas
-        Valor_Total=(14, 'sum')        # Somar o valor das multas
-    )
-    .reset_index()
-    .rename(columns={1: 'Placa do Veículo'})
-)
-
-# Ordenar os dados pelo valor total em ordem decrescente
-vehicle_summary = vehicle_summary.sort_values(by='Valor_Total', ascending=False)
+vehicle_summary = results.get_or_compute((state_key, "veiculos"), lambda: summarize_vehicles(filtered_data))
 
 # Criar o gráfico de barras
 fig = px.bar(
@@ -395,7 +447,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 
 # Infrações Mais Comuns
-required_columns = [8, 11, 5]  # Código da infração, Descrição, Auto de Infração
+required_columns = [ENQUADRAMENTO, DESCRICAO, AUTO_INFRACAO]
 missing_columns = [col for col in required_columns if col not in filtered_data.columns]
 if not missing_columns:
     st.markdown(
@@ -415,20 +467,17 @@ if not missing_columns:
         unsafe_allow_html=True
     )
 
-    # Filtrar registros únicos com base no índice Auto de Infração (5)
-    unique_infractions = filtered_data.drop_duplicates(subset=[5])
-
     # Selecionar apenas as colunas necessárias
-    filtered_infractions_data = unique_infractions[required_columns]
+    filtered_infractions_data = filtered_data[required_columns]
 
     # Criar o gráfico de infrações mais comuns
     common_infractions_chart = create_common_infractions_chart(filtered_infractions_data)
     st.plotly_chart(common_infractions_chart, use_container_width=True)
 else:
-    st.error(f"As colunas com os índices {missing_columns} não foram encontradas nos dados.")
+    st.error(f"As colunas {missing_columns} não foram encontradas nos dados.")
 
 # Distribuição por Dias da Semana
-if 9 in filtered_data.columns:
+if DATA_INFRACAO in filtered_data.columns:
     st.markdown(
         """
         <h2 style="
@@ -446,35 +495,7 @@ if 9 in filtered_data.columns:
         unsafe_allow_html=True
     )
 
-    # Filtrar registros únicos com base no índice do Auto de Infração (5)
-    unique_fines_weekday = filtered_data.drop_duplicates(subset=[5])
-
-    # Mapear os nomes dos dias da semana para português manualmente
-    day_translation = {
-        "Monday": "Segunda-feira",
-        "Tuesday": "Terça-feira",
-        "Wednesday": "Quarta-feira",
-        "Thursday": "Quinta-feira",
-        "Friday": "Sexta-feira",
-        "Saturday": "Sábado",
-        "Sunday": "Domingo",
-    }
-
-    # Agrupar por dia da semana
-    weekday_summary = (
-        unique_fines_weekday[9]
-        .dt.day_name()  # Obter o nome dos dias em inglês
-        .map(day_translation)  # Traduzir os nomes para português
-        .value_counts()
-        .reindex(
-            ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"],
-            fill_value=0  # Garantir que todos os dias apareçam, mesmo sem registros
-        )
-    )
-
-    # Converter para DataFrame para uso no gráfico
-    weekday_summary_df = weekday_summary.reset_index()
-    weekday_summary_df.columns = ['Dia da Semana', 'Quantidade de Multas']
+    weekday_summary_df = results.get_or_compute((state_key, "dias_da_semana"), lambda: summarize_weekdays(filtered_data))
 
     # Criar o gráfico
     import plotly.express as px
@@ -497,10 +518,10 @@ if 9 in filtered_data.columns:
 
     st.plotly_chart(weekday_chart, use_container_width=True)
 else:
-    st.error("A coluna com índice 9 (Data da Infração) não foi encontrada nos dados.")
+    st.error(f"A coluna '{DATA_INFRACAO}' não foi encontrada nos dados.")
 
 # Multas Acumuladas
-if 9 in filtered_data.columns and 14 in filtered_data.columns and 5 in filtered_data.columns:
+if all(col in filtered_data.columns for col in [DATA_INFRACAO, VALOR_A_PAGAR, AUTO_INFRACAO]):
     st.markdown(
         """
         <h2 style="
@@ -520,43 +541,12 @@ if 9 in filtered_data.columns and 14 in filtered_data.columns and 5 in filtered_
 
     try:
               
-        # Remover duplicados com base no Auto de Infração (índice 5)
-        unique_fines_accumulated = filtered_data.drop_duplicates(subset=[5])
+        unique_fines_accumulated = filtered_data
 
-        # Encontrar o ano mais antigo e mais recente nos dados
-        min_year = unique_fines_accumulated[9].dt.year.min()
-        max_year = unique_fines_accumulated[9].dt.year.max()
-        
-        if pd.isna(min_year):
-            min_year = datetime.now().year
-        if pd.isna(max_year):
-            max_year = datetime.now().year
-
-        # Criar uma lista de todos os meses do período
-        all_months = pd.period_range(
-            start=f"{min_year}-01", 
-            end=f"{max_year}-12", 
-            freq="M"
-        )
-
-        # Agrupar os dados por mês e calcular os totais
-        accumulated_summary = (
-            unique_fines_accumulated.groupby(unique_fines_accumulated[9].dt.to_period("M"))
-            .agg(
-                Quantidade_de_Multas=(5, 'count'),  # Contar Auto de Infração únicos
-                Valor_Total=(14, 'sum')            # Somar os valores das multas
-            )
-            .reset_index()
+        accumulated_summary = results.get_or_compute(
+            (state_key, "meses"), lambda: summarize_months(unique_fines_accumulated)
         )
 
-        # Ajustar o índice para incluir todos os meses do período
-        accumulated_summary.set_index(9, inplace=True)
-        accumulated_summary = accumulated_summary.reindex(all_months, fill_value=0).reset_index()
-        accumulated_summary.rename(columns={"index": "Período"}, inplace=True)
-
-        # Converter o período para formato de data para o gráfico
-        accumulated_summary["Período"] = accumulated_summary["Período"].dt.to_timestamp()
-
         # Criar o gráfico de linha
         accumulated_chart = px.line(
             accumulated_summary,
@@ -0,0 +1,92 @@
+import pandas as pd
+
+# Colunas da planilha de consultas ao DETRAN-RJ, na ordem em que aparecem no arquivo
+DIA_CONSULTA = "Dia da Consulta"
+PLACA = "Placa do Veículo"
+RENAVAM = "RENAVAM"
+CNPJ = "CNPJ"
+STATUS = "Status"
+AUTO_INFRACAO = "Auto de Infração"
+AUTO_RENAINF = "Auto de Renainf"
+DATA_PAGTO_DESCONTO = "Data para Pagto c/ Desconto"
+ENQUADRAMENTO = "Enquadramento"
+DATA_INFRACAO = "Data da Infração"
+HORA = "Hora"
+DESCRICAO = "Descrição"
+LOCAL_INFRACAO = "Local da Infração"
+VALOR_ORIGINAL = "Valor Original"
+VALOR_A_PAGAR = "Valor a Pagar"
+STATUS_PAGAMENTO = "Status de Pagamento"
+ORGAO_EMISSOR = "Órgão Emissor"
+AGENTE_EMISSOR = "Agente Emissor"
+
+COLUMNS = [
+    DIA_CONSULTA,
+    PLACA,
+    RENAVAM,
+    CNPJ,
+    STATUS,
+    AUTO_INFRACAO,
+    AUTO_RENAINF,
+    DATA_PAGTO_DESCONTO,
+    ENQUADRAMENTO,
+    DATA_INFRACAO,
+    HORA,
+    DESCRICAO,
+    LOCAL_INFRACAO,
+    VALOR_ORIGINAL,
+    VALOR_A_PAGAR,
+    STATUS_PAGAMENTO,
+    ORGAO_EMISSOR,
+    AGENTE_EMISSOR,
+]
+
+DATE_COLUMNS = [DIA_CONSULTA, DATA_PAGTO_DESCONTO, DATA_INFRACAO]
+# Valores monetários armazenados em centavos (Int64); usar parsers.centavos_to_reais para exibir
+MONEY_COLUMNS = [VALOR_ORIGINAL, VALOR_A_PAGAR]
+
+# Tipos das colunas de texto: categóricas para baixa cardinalidade, string para identificadores únicos
+TEXT_DTYPES = {
+    PLACA: "category",
+    RENAVAM: "category",
+    CNPJ: "category",
+    STATUS: "category",
+    AUTO_INFRACAO: "string",
+    AUTO_RENAINF: "string",
+    ENQUADRAMENTO: "category",
+    HORA: "category",
+    DESCRICAO: "category",
+    LOCAL_INFRACAO: "category",
+    STATUS_PAGAMENTO: "category",
+    ORGAO_EMISSOR: "category",
+    AGENTE_EMISSOR: "category",
+}
+
+
+def name_columns(data):
+    """
+    Substitui as posições das colunas da planilha pelos nomes do esquema.
+
+    Colunas excedentes mantêm o cabeçalho original do arquivo.
+    """
+    if len(data.columns) < len(COLUMNS):
+        missing = COLUMNS[len(data.columns):]
+        print(f"Planilha com colunas faltantes: {missing}")
+    rename_map = dict(zip(data.columns, COLUMNS))
+    return data.rename(columns=rename_map)
+
+
+def _to_text(series):
+    """Converte valores mistos (números lidos pelo Excel e textos) para string, preservando nulos."""
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        # Identificadores numéricos com nulos chegam como float (ex.: 329933248.0)
+        series = series.astype("Int64")
+    return series.astype("string").str.strip()
+
+
+def cast_text_columns(data):
+    """Aplica os tipos definidos em TEXT_DTYPES às colunas presentes."""
+    for col, dtype in TEXT_DTYPES.items():
+        if col in data.columns:
+            data[col] = _to_text(data[col]).astype(dtype)
+    return data
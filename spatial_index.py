@@ -0,0 +1,116 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = np.pi * EARTH_RADIUS_M / 180
+CELL_SIZE_DEGREES = 0.01  # Cerca de 1,1 km de latitude por célula
+CELL_KEY_BASE = 1 << 20  # Combina (linha, coluna) da grade em um único inteiro
+
+
+def haversine_m(lat, lng, latitudes, longitudes):
+    """Distância em metros de (lat, lng) até cada ponto dos arrays."""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class GridIndex:
+    """
+    Índice espacial em grade regular de latitude/longitude.
+
+    Cada célula guarda as posições (iloc) dos pontos que caem nela, de modo
+    que consultas por raio e por ponto mais próximo examinam apenas as
+    células vizinhas em vez do conjunto inteiro. Pontos sem coordenadas (NaN)
+    ficam fora do índice.
+
+    Parâmetros:
+        latitudes (array-like): Latitudes dos pontos.
+        longitudes (array-like): Longitudes dos pontos, na mesma ordem.
+        cell_size (float): Tamanho da célula em graus.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_size=CELL_SIZE_DEGREES):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.cell_size = cell_size
+
+        positions = np.flatnonzero(np.isfinite(self.latitudes) & np.isfinite(self.longitudes))
+        keys = self._cell_keys(self.latitudes[positions], self.longitudes[positions])
+        order = np.argsort(keys, kind="stable")
+        keys, positions = keys[order], positions[order]
+        unique_keys, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], len(keys))
+        self._buckets = {
+            int(key): positions[start:end] for key, start, end in zip(unique_keys, starts, ends)
+        }
+
+    def _cell(self, values):
+        return np.floor(np.asarray(values) / self.cell_size).astype(np.int64)
+
+    def _cell_keys(self, latitudes, longitudes):
+        return self._cell(latitudes) * CELL_KEY_BASE + self._cell(longitudes)
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def within(self, lat, lng, radius_m):
+        """
+        Retorna as posições dos pontos a até radius_m metros de (lat, lng), em ordem crescente.
+
+        Parâmetros:
+            lat (float): Latitude do centro.
+            lng (float): Longitude do centro.
+            radius_m (float): Raio em metros.
+
+        Retorna:
+            ndarray: Posições (iloc) dos pontos encontrados.
+        """
+        delta_lat = radius_m / METERS_PER_DEGREE
+        delta_lng = delta_lat / max(np.cos(np.radians(lat)), 1e-6)
+        rows = range(int(self._cell(lat - delta_lat)), int(self._cell(lat + delta_lat)) + 1)
+        columns = range(int(self._cell(lng - delta_lng)), int(self._cell(lng + delta_lng)) + 1)
+
+        buckets = [
+            self._buckets[key]
+            for key in (row * CELL_KEY_BASE + column for row in rows for column in columns)
+            if key in self._buckets
+        ]
+        if not buckets:
+            return np.array([], dtype=np.int64)
+        candidates = np.concatenate(buckets)
+        distances = haversine_m(lat, lng, self.latitudes[candidates], self.longitudes[candidates])
+        return np.sort(candidates[distances <= radius_m])
+
+    def within_bounds(self, south, west, north, east):
+        """
+        Retorna as posições dos pontos dentro do retângulo, em ordem crescente.
+
+        Percorre apenas as células que cruzam o retângulo; quando ele cobre
+        mais células do que as ocupadas (zoom muito afastado), filtra todos os
+        pontos de uma vez.
+        """
+        rows = range(int(self._cell(south)), int(self._cell(north)) + 1)
+        columns = range(int(self._cell(west)), int(self._cell(east)) + 1)
+        if len(rows) * len(columns) > len(self._buckets):
+            candidates = np.flatnonzero(np.isfinite(self.latitudes) & np.isfinite(self.longitudes))
+        else:
+            buckets = [
+                self._buckets[key]
+                for key in (row * CELL_KEY_BASE + column for row in rows for column in columns)
+                if key in self._buckets
+            ]
+            if not buckets:
+                return np.array([], dtype=np.int64)
+            candidates = np.concatenate(buckets)
+
+        latitudes, longitudes = self.latitudes[candidates], self.longitudes[candidates]
+        inside = (latitudes >= south) & (latitudes <= north) & (longitudes >= west) & (longitudes <= east)
+        return np.sort(candidates[inside])
+
+    def nearest(self, lat, lng, max_distance_m):
+        """Retorna a posição do ponto mais próximo a até max_distance_m metros, ou None."""
+        candidates = self.within(lat, lng, max_distance_m)
+        if len(candidates) == 0:
+            return None
+        distances = haversine_m(lat, lng, self.latitudes[candidates], self.longitudes[candidates])
+        return int(candidates[np.argmin(distances)])
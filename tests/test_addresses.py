@@ -0,0 +1,55 @@
+import pytest
+from addresses import canonicalize, parse_address
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("AV. BRASIL, 500", "avenida brasil 500"),
+    ("AVENIDA BRASIL 500", "avenida brasil 500"),
+    ("Av Brasil nº500", "avenida brasil 500"),
+    ("BR-101 KM-383 UF-RJ -RIO DE JANEIRO", "br101 km 383 - rio janeiro"),
+    ("RUA 7 DE SETEMBRO 100", "rua 7 de setembro 100"),
+    ("RUA 7 DE SETEMBRO 900", "rua 7 de setembro 900"),
+    ("AV. 13 DE MAIO, 50", "avenida 13 de maio 50"),
+    ("RUA 25 DE MARCO 10", "rua 25 de marco 10"),
+])
+def test_canonicalize(text, expected):
+    assert canonicalize(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "RUA 7 DE SETEMBRO 100",
+    "AV. 13 DE MAIO, 50",
+    "BR-101 KM-383 UF-RJ -RIO DE JANEIRO",
+    "SPD 128/021 KM 000 METROS 200 -ARUJA",
+])
+def test_canonicalize_is_idempotent(text):
+    assert canonicalize(canonicalize(text)) == canonicalize(text)
+
+
+def test_numbers_in_street_name_are_not_the_house_number():
+    assert canonicalize("RUA 7 DE SETEMBRO 100") != canonicalize("RUA 7 DE SETEMBRO 900")
+    address = parse_address("RUA 25 DE MARCO 10")
+    assert address.street == ("rua", "25 de", "marco")
+    assert address.number == 10
+
+
+@pytest.mark.parametrize("streets", [
+    ["RUA A 100", "RUA E 100", "RUA NORTE 100", "RUA SUL 100", "RUA 1 100", "RUA 2 100"],
+    ["AV LESTE 5", "AVENIDA OESTE 5"],
+])
+def test_different_streets_do_not_collide(streets):
+    keys = [canonicalize(street) for street in streets]
+    assert len(set(keys)) == len(keys)
+    assert all(canonicalize(key) == key for key in keys)
+
+
+def test_single_word_street_name_is_kept():
+    assert canonicalize("RUA A 100") == "rua a 100"
+    assert canonicalize("AV LESTE 5") == "avenida leste 5"
+    address = parse_address("RUA 1 100")
+    assert address.street == ("rua", "1")
+    assert address.number == 100
+
+
+def test_direction_after_a_named_street_is_dropped():
+    assert canonicalize("AV BRASIL 500 SENTIDO NORTE") == canonicalize("AV. BRASIL, 500")
@@ -0,0 +1,149 @@
+import json
+import sqlite3
+import pytest
+import coordinate_store
+from addresses import canonicalize
+from coordinate_store import MIGRATIONS, CoordinateCache, CoordinateStore
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "coordenadas.db"), str(tmp_path / "coordenadas.json")
+
+
+def test_legacy_json_is_imported_once(paths):
+    db_path, json_path = paths
+    with open(json_path, "w") as file:
+        json.dump({"rua a 1": [-22.9, -43.2], "rua b 2": [None, None], "rua c 3": "invalido"}, file)
+
+    store = CoordinateStore(db_path, json_path)
+    assert store.get_many(["rua a 1", "rua b 2", "rua c 3"]) == {"rua a 1": (-22.9, -43.2)}
+
+    # Reabrir não importa de novo (nem sobrescreve) o JSON
+    store.put("rua a 1", -22.0, -43.0)
+    with open(json_path, "w") as file:
+        json.dump({"rua a 1": [1.0, 1.0], "rua d 4": [2.0, 2.0]}, file)
+    reopened = CoordinateStore(db_path, json_path)
+    assert reopened.get("rua a 1") == (-22.0, -43.0)
+    assert reopened.get("rua d 4") is None
+
+
+def test_v1_store_is_migrated(paths):
+    db_path, json_path = paths
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE coordinates (key TEXT PRIMARY KEY, lat REAL NOT NULL, lng REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    connection.execute("INSERT INTO coordinates VALUES ('rua a 1', -22.9, -43.2, 0)")
+    connection.execute("PRAGMA user_version = 1")
+    connection.commit()
+    connection.close()
+
+    store = CoordinateStore(db_path, json_path)
+    version = store._connection().execute("PRAGMA user_version").fetchone()[0]
+    assert version == len(MIGRATIONS)
+    assert store.get("rua a 1") == (-22.9, -43.2)
+    store.put_failures({"rua z 9": ("no_result", 4102444800.0)})
+    store.replace_gazetteer([("br101", 383.0, -22.5, -44.0)], "marcos.csv")
+    assert store.get_failures(["rua z 9"]) == {"rua z 9": ("no_result", 4102444800.0)}
+    assert list(store.gazetteer_entries()) == [("br101", 383.0, -22.5, -44.0)]
+
+
+def test_upsert_and_many_keys(paths):
+    store = CoordinateStore(*paths)
+    store.put_many({f"rua {number}": (number, -number) for number in range(1200)})
+    store.put("rua 7", 70.0, -70.0)
+    found = store.get_many(f"rua {number}" for number in range(0, 1300, 2))
+    assert len(found) == 600  # Consultas IN em blocos de SQLITE_MAX_VARIABLES chaves
+    assert found["rua 8"] == (8, -8)
+    assert store.get("rua 7") == (70.0, -70.0)
+    assert len(store) == 1200
+
+
+def test_export_json_round_trip(paths, tmp_path):
+    store = CoordinateStore(*paths)
+    store.put_many({"rua a 1": (-22.9, -43.2), "rua b 2": (-22.8, -43.1)})
+    store.export_json(str(tmp_path / "exportado.json"))
+    copy = CoordinateStore(str(tmp_path / "copia.db"), str(tmp_path / "exportado.json"))
+    assert dict((key, (lat, lng)) for key, lat, lng in copy.items()) == store.get_many(["rua a 1", "rua b 2"])
+
+
+TTL = {"no_result": 100, "timeout": 10, "auth_error": 0}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(coordinate_store.time, "time", lambda: now[0])
+    return now
+
+
+def test_failures_expire_by_reason(paths, clock):
+    store = CoordinateStore(*paths)
+    cache = CoordinateCache(store)
+    cache.put_failures({"rua a 1": "no_result", "rua b 2": "timeout", "rua c 3": "auth_error"}, TTL)
+    cache.flush()
+    assert cache.get_failures(["rua a 1", "rua b 2", "rua c 3"]) == {"rua a 1": "no_result", "rua b 2": "timeout"}
+
+    clock[0] += 50
+    assert cache.get_failures(["rua a 1", "rua b 2"]) == {"rua a 1": "no_result"}
+    # Um processo novo lê do SQLite a mesma expiração
+    assert set(CoordinateCache(store).get_failures(["rua a 1", "rua b 2", "rua c 3"])) == {"rua a 1"}
+
+    clock[0] += 100
+    assert cache.get_failures(["rua a 1"]) == {}
+    assert store.get_failures(["rua a 1"]) == {}
+
+
+def test_found_coordinates_clear_the_failure(paths, clock):
+    store = CoordinateStore(*paths)
+    cache = CoordinateCache(store)
+    cache.put_failures({"rua a 1": "timeout"}, TTL)
+    cache.flush()
+    cache.put("rua a 1", -22.9, -43.2)
+    cache.flush()
+    assert cache.get_failures(["rua a 1"]) == {}
+    assert store.get_failures(["rua a 1"]) == {}
+    assert store.get("rua a 1") == (-22.9, -43.2)
+
+
+def test_version_changes_only_with_its_own_keys(paths, clock):
+    cache = CoordinateCache(CoordinateStore(*paths))
+    keys = ["rua a 1", "rua b 2"]
+    before = cache.version(keys)
+
+    cache.put("rua c 3", -22.9, -43.2)
+    cache.put_failures({"rua a 1": "timeout"}, TTL)
+    assert cache.version(keys) == before
+
+    cache.put_many({"rua b 2": (-22.8, -43.1), "rua d 4": (-22.7, -43.0)})
+    assert cache.version(keys) != before
+    assert cache.version([]) == 0
+
+
+def test_purge_failures(paths, clock):
+    store = CoordinateStore(*paths)
+    store.put_failures({
+        "rua a 1": ("no_result", clock[0] + 100),
+        "rua b 2": ("timeout", clock[0] - 1),
+        "rua c 3": ("timeout", clock[0] + 100),
+    })
+    assert store.purge_failures(expired_only=True) == 1
+    assert store.purge_failures("timeout") == 1
+    assert set(store.get_failures(["rua a 1", "rua b 2", "rua c 3"])) == {"rua a 1"}
+
+
+def test_rekey_merges_keys_keeping_the_latest(paths, clock):
+    store = CoordinateStore(*paths)
+    store.put("AV. BRASIL, 500", -22.0, -43.0)
+    clock[0] += 10
+    store.put("Avenida Brasil 500", -22.87, -43.25)
+    store.put_failures({
+        "AV BRASIL 500": ("no_result", clock[0] + 100),  # Já tem coordenadas após o rekey: descartada
+        "RUA A 100": ("timeout", clock[0] + 100),
+        "Rua A 100": ("no_result", clock[0] + 500),
+    })
+
+    assert store.rekey(canonicalize) == (2, 1)
+    assert dict((key, (lat, lng)) for key, lat, lng in store.items()) == {"avenida brasil 500": (-22.87, -43.25)}
+    assert store.get_failures(["avenida brasil 500", "rua a 100"]) == {"rua a 100": ("no_result", clock[0] + 500)}
@@ -0,0 +1,47 @@
+import io
+import hashlib
+import pytest
+import data_pipeline
+import drive_loader
+
+OLD, NEW = b"planilha antiga", b"planilha nova"
+
+
+@pytest.fixture
+def drive(monkeypatch, tmp_path):
+    """Drive falso: os metadados em cache são da versão antiga; o arquivo já foi substituído."""
+    monkeypatch.setattr(drive_loader, "DRIVE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        drive_loader, "get_file_metadata", lambda file_id, credentials: {"md5Checksum": hashlib.md5(OLD).hexdigest()}
+    )
+    current = {"content": NEW, "md5Checksum": hashlib.md5(NEW).hexdigest()}
+    monkeypatch.setattr(
+        drive_loader, "request_file_metadata", lambda file_id, credentials: {"md5Checksum": current["md5Checksum"]}
+    )
+    monkeypatch.setattr(
+        drive_loader, "download_file_from_drive", lambda file_id, credentials: io.BytesIO(current["content"])
+    )
+    return current
+
+
+def test_revision_comes_from_the_downloaded_file(drive, tmp_path):
+    revision, file_buffer = drive_loader.fetch_file_from_drive("arquivo", {})
+    assert revision == hashlib.md5(NEW).hexdigest()
+    assert file_buffer.read() == NEW
+    assert (tmp_path / f"{revision}.xlsx").read_bytes() == NEW
+
+
+def test_corrupted_download_is_rejected(drive, tmp_path):
+    drive["content"] = b"download corrompido"
+    with pytest.raises(ValueError):
+        drive_loader.fetch_file_from_drive("arquivo", {})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_corrupted_download_does_not_write_a_snapshot(drive, tmp_path, monkeypatch):
+    snapshots = tmp_path / "snapshots"
+    monkeypatch.setattr(data_pipeline, "SNAPSHOT_DIR", str(snapshots))
+    drive["content"] = b"download corrompido"
+    with pytest.raises(ValueError):
+        data_pipeline.load_revision.__wrapped__(hashlib.md5(OLD).hexdigest(), "arquivo", {})
+    assert not snapshots.exists()
@@ -0,0 +1,62 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from filter_index import FilterIndex
+from schema import DATA_INFRACAO, ENQUADRAMENTO, PLACA, STATUS
+
+PLATES = ["ABC1D23", "XYZ9K87", "JKL4M56", None]
+CODES = ["5010", "7455", "6050", "5185", None]
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(42)
+    size = 2000
+    dates = pd.Series(pd.to_datetime("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, size), unit="D"))
+    dates += pd.to_timedelta(rng.integers(0, 24 * 60, size), unit="min")  # Horário não afeta o filtro por dia
+    dates[rng.random(size) < 0.05] = pd.NaT
+    frame = pd.DataFrame({
+        DATA_INFRACAO: dates,
+        PLACA: pd.Categorical(rng.choice(PLATES, size)),
+        ENQUADRAMENTO: rng.choice(CODES, size).astype(object),
+        STATUS: rng.choice(["Em aberto", "Pago"], size),
+    })
+    return frame.iloc[rng.permutation(size)].set_axis(rng.permutation(size) * 3)  # Índice fora de ordem
+
+
+def reference(data, start, end, selections):
+    days = data[DATA_INFRACAO].dt.normalize()
+    mask = days.between(pd.Timestamp(start), pd.Timestamp(end))
+    for column, values in selections.items():
+        if values:
+            mask &= data[column].isin(values)
+    return data[mask]
+
+
+@pytest.mark.parametrize("start, end, selections", [
+    (date(2023, 1, 1), date(2024, 12, 31), {}),
+    (date(2023, 3, 15), date(2023, 3, 15), {}),
+    (date(2023, 6, 1), date(2024, 2, 29), {PLACA: ["ABC1D23"]}),
+    (date(2023, 1, 1), date(2024, 12, 31), {PLACA: ["XYZ9K87", "JKL4M56"], ENQUADRAMENTO: ["5010", "6050"]}),
+    (date(2024, 1, 1), date(2024, 6, 30), {STATUS: ["Pago"], ENQUADRAMENTO: []}),
+    (date(2023, 1, 1), date(2024, 12, 31), {PLACA: ["NAO EXISTE"]}),
+    (date(2025, 1, 1), date(2025, 12, 31), {}),
+])
+def test_select_matches_pandas(data, start, end, selections):
+    index = FilterIndex(data)
+    expected = reference(data, start, end, selections)
+    assert data.iloc[index.select(start, end, selections)].index.tolist() == expected.index.tolist()
+    pd.testing.assert_frame_equal(index.filter(start, end, selections), expected)
+
+
+def test_unfiltered_result_is_the_data_itself():
+    frame = pd.DataFrame({DATA_INFRACAO: pd.to_datetime(["2024-01-01", "2024-01-02"]), PLACA: ["A", "B"]})
+    index = FilterIndex(frame)
+    assert index.filter(date(2024, 1, 1), date(2024, 1, 2)) is frame
+
+
+def test_counts_and_bounds(data):
+    index = FilterIndex(data)
+    assert index.counts[PLACA] == data[PLACA].value_counts().sort_index().to_dict()
+    assert index.date_bounds == (data[DATA_INFRACAO].min(), data[DATA_INFRACAO].max())
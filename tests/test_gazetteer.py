@@ -0,0 +1,67 @@
+import pytest
+import geo_utils
+from coordinate_store import CoordinateCache, CoordinateStore
+from gazetteer import MIN_CONFIDENCE, Gazetteer
+
+
+@pytest.fixture
+def gazetteer():
+    gazetteer = Gazetteer()
+    gazetteer.add("avenida brasil 500 - rio de janeiro", -22.87, -43.25)
+    gazetteer.add("avenida brasil 1500 - rio de janeiro", -22.86, -43.27)
+    return gazetteer
+
+
+def test_known_number_is_exact(gazetteer):
+    match = gazetteer.match("AV. BRASIL, 500 - RIO DE JANEIRO")
+    assert (match.lat, match.lng, match.confidence) == (-22.87, -43.25, 1.0)
+
+
+def test_close_number_is_interpolated(gazetteer):
+    match = gazetteer.match("AV BRASIL 520 -RIO DE JANEIRO")
+    assert match.confidence >= MIN_CONFIDENCE
+    assert -22.87 < match.lat < -22.86
+
+
+@pytest.mark.parametrize("text", [
+    "RUA DAS FLORES 100 - NITEROI",
+    "RUA MARQUES DE PARANA 100",
+    "RUA NORTE 100",
+])
+def test_place_contained_in_the_query_is_not_trusted(text):
+    gazetteer = Gazetteer()
+    gazetteer.add("rua", -22.90, -43.10)  # Lugar só com o tipo do logradouro
+    match = gazetteer.match(text)
+    assert match is None or match.confidence < MIN_CONFIDENCE
+
+
+def test_similar_street_name_is_not_trusted(gazetteer):
+    assert gazetteer.match("AVENIDA BRASILIA 100 -RIO DE JANEIRO").confidence < MIN_CONFIDENCE
+    assert gazetteer.match("AV BRAZIL 500 -RIO DE JANEIRO").confidence < MIN_CONFIDENCE
+
+
+def test_far_number_is_not_trusted(gazetteer):
+    assert gazetteer.match("AV BRASIL 20000 -RIO DE JANEIRO").confidence < MIN_CONFIDENCE
+    assert gazetteer.match("AV BRASIL 1000 -RIO DE JANEIRO").confidence < MIN_CONFIDENCE
+
+
+def test_far_number_falls_through_to_api(gazetteer, tmp_path, monkeypatch):
+    cache = CoordinateCache(CoordinateStore(str(tmp_path / "cache.db"), str(tmp_path / "cache.json")))
+    queries = []
+
+    def fake_batch(locations, api_key, **options):
+        locations = list(locations)
+        queries.extend(locations)
+        return {location: (-22.80, -43.30, None) for location in locations}
+
+    monkeypatch.setattr(geo_utils, "get_cache", lambda: cache)
+    monkeypatch.setattr(geo_utils, "get_gazetteer", lambda: gazetteer)
+    monkeypatch.setattr(geo_utils, "geocode_batch", fake_batch)
+
+    coordinates = geo_utils.lookup_coordinates(
+        ["AV BRASIL 20000 -RIO DE JANEIRO", "AV BRASIL 500 -RIO DE JANEIRO"], "chave"
+    )
+    cache.close()
+
+    assert queries == ["av brasil 20000 -rio de janeiro"]
+    assert coordinates.tolist() == [[-22.80, -43.30], [-22.87, -43.25]]
@@ -0,0 +1,125 @@
+import json
+import time
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import geo_utils
+from coordinate_store import CoordinateCache, CoordinateStore
+from gazetteer import Gazetteer
+
+
+def test_interrupt_cancels_pending_and_keeps_finished(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_geocode(local, api_key, base_url=None, rate_limiter=None):
+        with lock:
+            calls.append(local)
+        time.sleep(0.05)
+        return (1.0, 2.0, None)
+
+    monkeypatch.setattr(geo_utils, "geocode", fake_geocode)
+    received = {}
+
+    def on_result(local, result):
+        received[local] = result
+        if len(received) == 1:
+            raise KeyboardInterrupt
+
+    locations = [f"rua {number}" for number in range(50)]
+    with pytest.raises(KeyboardInterrupt):
+        geo_utils.geocode_batch(locations, "chave", max_workers=2, rate_limit=1000, on_result=on_result)
+
+    # As consultas em andamento na interrupção são entregues; as pendentes nem começam
+    assert len(calls) < len(locations)
+    assert set(received) == set(calls)
+
+
+def test_single_lookup_is_written_to_disk(monkeypatch, tmp_path):
+    store = CoordinateStore(str(tmp_path / "coordenadas.db"), str(tmp_path / "coordenadas.json"))
+    monkeypatch.setattr(geo_utils, "get_cache", lambda: CoordinateCache(store))
+    monkeypatch.setattr(geo_utils, "match_offline", lambda keys: {})
+    monkeypatch.setattr(geo_utils, "get_gazetteer", Gazetteer)
+    monkeypatch.setattr(geo_utils, "geocode", lambda local, api_key: (1.0, 2.0, None))
+
+    assert geo_utils.get_cached_coordinates("Rua Um 10", "chave") == (1.0, 2.0)
+    assert len(store) == 1
+
+
+
+class GeocoderHandler(BaseHTTPRequestHandler):
+    """Servidor de geocodificação de teste; a resposta depende do local consultado ("q")."""
+
+    calls = Counter()
+
+    def do_GET(self):
+        local = parse_qs(urlparse(self.path).query)["q"][0]
+        self.calls[local] += 1
+        if local == "lento":
+            time.sleep(0.5)
+        if local == "negado":
+            return self.reply(403, {})
+        if local == "quebrado" or (local == "ocupado" and self.calls[local] <= 2):
+            return self.reply(429 if local == "ocupado" else 500, {})
+        if local == "vazio":
+            return self.reply(200, {"results": []})
+        if local == "estranho":
+            return self.reply(200, {"results": [{"formatted": "sem geometria"}]})
+        self.reply(200, {"results": [{"geometry": {"lat": -22.9, "lng": -43.2}}]})
+
+    def reply(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def geocoder(monkeypatch):
+    monkeypatch.setattr(geo_utils, "GEOCODING_BACKOFF", 0.01)
+    GeocoderHandler.calls.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GeocoderHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/geocode"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("local, expected", [
+    ("rua a 1", (-22.9, -43.2, None)),
+    ("vazio", (None, None, "no_result")),
+    ("estranho", (None, None, "http_error")),
+    ("negado", (None, None, "auth_error")),
+    ("quebrado", (None, None, "http_error")),
+])
+def test_failure_reasons(geocoder, local, expected):
+    assert geo_utils.geocode(local, "chave", base_url=geocoder) == expected
+
+
+def test_timeout(geocoder):
+    assert geo_utils.geocode("lento", "chave", timeout=0.1, base_url=geocoder, max_retries=0) == (None, None, "timeout")
+
+
+def test_retries_on_429_and_5xx(geocoder):
+    assert geo_utils.geocode("ocupado", "chave", base_url=geocoder) == (-22.9, -43.2, None)
+    assert GeocoderHandler.calls["ocupado"] == 3
+    geo_utils.geocode("quebrado", "chave", base_url=geocoder)
+    assert GeocoderHandler.calls["quebrado"] == geo_utils.GEOCODING_MAX_RETRIES + 1
+
+
+def test_batch_respects_the_rate_limit(geocoder):
+    locations = [f"rua {number}" for number in range(15)]
+    started = time.monotonic()
+    results = geo_utils.geocode_batch(locations, "chave", max_workers=8, rate_limit=10, base_url=geocoder)
+    # 10 requisições saem de imediato (capacidade do balde); as outras 5 esperam 0,1 s cada
+    assert time.monotonic() - started >= 0.45
+    assert all(reason is None for _, _, reason in results.values())
+    assert len(results) == len(locations)
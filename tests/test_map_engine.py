@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit_folium
+from streamlit.testing.v1 import AppTest
+from map_engine import build_map, cached_bins, map_payload, render_map
+from result_cache import ResultCache
+
+
+def map_script():
+    import pandas as pd
+    import streamlit as st
+    from streamlit_folium import st_folium
+    from map_engine import ViewportMap, build_map, get_location_summary
+
+    data = pd.DataFrame({
+        "Latitude": [-22.90, -22.80, -22.80, -22.95],
+        "Longitude": [-43.10, -43.20, -43.20, -43.25],
+        "Local da Infração": ["RUA A 1", "RUA B 2", "RUA B 2", "RUA C 3"],
+        "Valor a Pagar": [19515, 29347, 29347, 88038],
+        "Data da Infração": pd.to_datetime(["2024-01-05", "2024-02-10", "2024-03-15", "2024-04-20"]),
+    })
+    summary = get_location_summary("dados", data)
+    if st.session_state.mode == "viewport":
+        ViewportMap(summary).display("mapa_multas", width="100%", height=1000)
+    else:
+        st_folium(
+            build_map(data, st.session_state.mode, summary=summary, fingerprint="dados"), width="100%", height=1000
+        )
+
+
+@pytest.fixture
+def payloads(monkeypatch):
+    calls = []
+    monkeypatch.setattr(streamlit_folium, "_component_func", lambda **kwargs: calls.append(kwargs))
+    return calls
+
+
+def without_callbacks(payload):
+    return {name: value for name, value in payload.items() if name != "on_change"}
+
+
+@pytest.mark.parametrize("mode", ["markers", "heatmap"])
+def test_map_payload_is_stable_across_reruns(payloads, mode):
+    app = AppTest.from_function(map_script)
+    app.session_state.mode = mode
+    app.run()
+    app.run()
+
+    assert not app.exception
+    first, second = payloads
+    assert without_callbacks(first) == without_callbacks(second)
+
+
+def test_viewport_payload_changes_only_the_layer(payloads):
+    app = AppTest.from_function(map_script)
+    app.session_state.mode = "viewport"
+    app.run()
+    app.run()
+    app.session_state["mapa_multas"] = {
+        "bounds": {"_southWest": {"lat": -22.85, "lng": -43.25}, "_northEast": {"lat": -22.75, "lng": -43.15}},
+        "zoom": 13,
+    }
+    app.run()
+    app.run()
+
+    assert not app.exception
+    initial, initial_again, moved, repeated = map(without_callbacks, payloads)
+    assert initial == initial_again
+    assert moved == repeated
+    # Só a camada dinâmica muda com a área visível; o mapa base (e o componente) continua o mesmo
+    assert moved["feature_group"] != initial["feature_group"]
+    assert {**moved, "feature_group": None} == {**initial, "feature_group": None}
+
+
+def test_heatmap_bins_follow_the_fingerprint():
+    # Acima de 500 mil elementos o Streamlit calcularia o hash dos arrays por amostragem
+    rng = np.random.default_rng(0)
+    points = pd.DataFrame({"Latitude": rng.uniform(-23, -22, 600_000), "Longitude": rng.uniform(-44, -43, 600_000)})
+    moved = points.copy()
+    moved.loc[123_456, ["Latitude", "Longitude"]] = [-22.0, -43.0]
+
+    cached_bins.clear()
+    before = cached_bins("filtros-1", "count", points)
+    after = cached_bins("filtros-2", "count", moved)
+    assert not before.equals(after)
+    assert cached_bins("filtros-1", "count", moved).equals(before)  # Mesma impressão digital: grade guardada
+
+
+@pytest.mark.parametrize("mode", ["markers", "heatmap"])
+def test_cached_payload_renders_the_same_map(payloads, mode):
+    data = pd.DataFrame({
+        "Latitude": [-22.90, -22.80, -22.80],
+        "Longitude": [-43.10, -43.20, -43.20],
+        "Local da Infração": ["RUA A 1", "RUA B 2", "RUA B 2"],
+        "Valor a Pagar": [19515, 29347, 29347],
+        "Data da Infração": pd.to_datetime(["2024-01-05", "2024-02-10", "2024-03-15"]),
+    })
+    cache = ResultCache()
+    for _ in range(2):
+        payload = cache.get_or_compute(("dados", "mapa", mode), lambda: map_payload(data, mode))
+        streamlit_folium.st_folium(render_map(payload), height=1000)
+    streamlit_folium.st_folium(build_map(data, mode), height=1000)
+
+    assert cache.stats()["hits"] == 1
+    assert isinstance(payload.data_json, str)
+    first, second, direct = map(without_callbacks, payloads)
+    assert first == second == direct
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from parsers import centavos_to_reais, parse_brl_to_centavos, parse_dates
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("R$ 1.234,56", 123456),
+    ("1.234.567,89", 123456789),
+    ("195,23", 19523),
+    ("195.23", 19523),
+    ("R$ 0,01", 1),
+    ("-10,00", -1000),
+    ("(10,00)", -1000),
+    ("R$ -1.000,00", -100000),
+    ("1.000", 100000),  # Ponto como milhar, sem centavos
+    ("  88,38 ", 8838),
+    (130.16, 13016),
+    (0.1 + 0.2, 30),  # Erro de ponto flutuante não vira 29 centavos
+    ("", pd.NA),
+    ("Não disponível", pd.NA),
+    ("1,2,3", pd.NA),
+    (None, pd.NA),
+])
+def test_brl_to_centavos(value, expected):
+    result = parse_brl_to_centavos(pd.Series(["R$ 5,00", value], dtype=object))
+    assert result.dtype == "Int64"
+    assert result.iloc[0] == 500
+    if expected is pd.NA:
+        assert pd.isna(result.iloc[1])
+    else:
+        assert result.iloc[1] == expected
+
+
+def test_numeric_column_and_index_are_kept():
+    series = pd.Series([19.515, 293.47, np.nan], index=[10, 20, 30], name="Valor")
+    result = parse_brl_to_centavos(series)
+    assert result.tolist()[:2] == [1952, 29347]
+    assert pd.isna(result.iloc[2])
+    assert list(result.index) == [10, 20, 30]
+    assert result.name == "Valor"
+
+
+def test_repeated_values_are_broadcast():
+    series = pd.Series(["R$ 1,00", None, "R$ 1,00", "2,50"] * 3)
+    assert parse_brl_to_centavos(series).tolist() == [100, pd.NA, 100, 250] * 3
+
+
+def test_centavos_to_reais():
+    assert centavos_to_reais(pd.Series([12345, pd.NA], dtype="Int64")).tolist()[0] == 123.45
+    assert centavos_to_reais(250) == 2.5
+    assert centavos_to_reais(pd.NA) == 0.0
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("05/03/2024", "2024-03-05"),  # Dia primeiro (formato da planilha), nunca mês primeiro
+    ("31/12/2023 23:59", "2023-12-31 23:59"),
+    ("01/02/2024 08:30:15", "2024-02-01 08:30:15"),
+    ("2024-03-05", "2024-03-05"),
+    ("2024-03-05 10:00:00", "2024-03-05 10:00"),
+    ("05-03-2024", "2024-03-05"),
+    (" 05/03/2024 ", "2024-03-05"),
+    ("29/02/2024", "2024-02-29"),
+    ("2023", "2023-01-01"),  # Ano isolado
+    (2023, "2023-01-01"),
+    (45356, "2024-03-05"),  # Serial do Excel
+    ("45356", "2024-03-05"),
+    (45356.5, "2024-03-05 12:00"),
+    (pd.Timestamp("2024-03-05 07:00"), "2024-03-05 07:00"),
+    ("29/02/2023", None),  # Data inexistente
+    ("32/01/2024", None),
+    ("Sem data", None),
+    ("", None),
+    (None, None),
+    (-5, None),
+])
+def test_parse_dates(value, expected):
+    result = parse_dates(pd.Series(["01/01/2024", value], dtype=object))
+    assert result.dtype == "datetime64[ns]"
+    assert result.iloc[0] == pd.Timestamp("2024-01-01")
+    if expected is None:
+        assert pd.isna(result.iloc[1])
+    else:
+        assert result.iloc[1] == pd.Timestamp(expected)
+
+
+def test_parse_dates_keeps_typed_columns():
+    dates = pd.Series(pd.to_datetime(["2024-03-05", None]), index=[7, 8])
+    result = parse_dates(dates)
+    assert result.dtype == "datetime64[ns]"
+    assert list(result.index) == [7, 8]
+    assert parse_dates(pd.Series([45356.0, np.nan])).iloc[0] == pd.Timestamp("2024-03-05")
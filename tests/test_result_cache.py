@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+from result_cache import ResultCache, estimate_size
+
+
+def test_size_counts_string_contents():
+    short = pd.DataFrame({"Local": ["A"] * 1000})
+    long = pd.DataFrame({"Local": ["RUA " + "X" * 200] * 1000})
+    assert estimate_size(long) > estimate_size(short) + 1000 * 200
+
+
+def test_oldest_results_are_evicted_over_the_limit():
+    cache = ResultCache(max_bytes=3 * 8000)
+    for key in range(4):
+        cache.get_or_compute(key, lambda: np.zeros(1000))
+    assert len(cache) == 3
+    assert cache.get_or_compute(0, lambda: None) is None  # Descartado: calculado de novo
@@ -0,0 +1,103 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from map_engine import LocationSummary
+from schema import DATA_INFRACAO, LOCAL_INFRACAO, VALOR_A_PAGAR
+from spatial_index import GridIndex
+
+QUERIES = [(-22.9, -43.2), (-22.95, -43.15), (-22.8801, -43.2999), (-23.5, -46.6)]
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(7)
+    size = 3000
+    latitudes = -22.9 + rng.normal(0, 0.05, size)
+    longitudes = -43.2 + rng.normal(0, 0.05, size)
+    latitudes[:20] = np.round(latitudes[:20], 2)  # Exatamente sobre a borda das células
+    latitudes[rng.random(size) < 0.03] = np.nan
+    return pd.DataFrame({"Latitude": latitudes, "Longitude": longitudes})
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * 6371000.0 * math.asin(math.sqrt(a))
+
+
+def reference_distances(points, lat, lng):
+    located = points.dropna()
+    return pd.Series(
+        [distance_m(lat, lng, row.Latitude, row.Longitude) for row in located.itertuples()],
+        index=located.index,
+    )
+
+
+@pytest.mark.parametrize("lat, lng", QUERIES)
+@pytest.mark.parametrize("radius_m", [1, 250, 1500, 20000])
+def test_within_matches_brute_force(points, lat, lng, radius_m):
+    index = GridIndex(points["Latitude"], points["Longitude"])
+    distances = reference_distances(points, lat, lng)
+    # Folga de 1 mm para diferenças de arredondamento entre as duas fórmulas
+    expected = distances[distances <= radius_m - 1e-3].index
+    found = index.within(lat, lng, radius_m)
+    assert set(expected) <= set(found)
+    assert set(found) <= set(distances[distances <= radius_m + 1e-3].index)
+    assert list(found) == sorted(found)
+
+
+@pytest.mark.parametrize("lat, lng", QUERIES)
+@pytest.mark.parametrize("max_distance_m", [50, 800, 20000])
+def test_nearest_matches_brute_force(points, lat, lng, max_distance_m):
+    index = GridIndex(points["Latitude"], points["Longitude"])
+    distances = reference_distances(points, lat, lng)
+    found = index.nearest(lat, lng, max_distance_m)
+    if distances.min() > max_distance_m:
+        assert found is None
+    else:
+        assert distances[found] == pytest.approx(distances.min())
+
+
+@pytest.mark.parametrize("south, west, north, east", [
+    (-22.95, -43.25, -22.85, -43.15),
+    (-22.901, -43.201, -22.899, -43.199),
+    (-30.0, -50.0, -10.0, -40.0),  # Cobre mais células do que as ocupadas
+    (-23.6, -46.7, -23.4, -46.5),
+])
+def test_within_bounds_matches_pandas(points, south, west, north, east):
+    index = GridIndex(points["Latitude"], points["Longitude"])
+    expected = points[
+        points["Latitude"].between(south, north) & points["Longitude"].between(west, east)
+    ].index
+    assert index.within_bounds(south, west, north, east).tolist() == expected.tolist()
+
+
+def test_find_clicked_returns_every_location_within_tolerance():
+    # Três endereços a poucos metros um do outro e um quarto bem mais longe
+    coordinates = [(-22.9, -43.2), (-22.90005, -43.2), (-22.9001, -43.2), (-22.91, -43.2)]
+    rows = [0, 1, 1, 2, 3, 0, 2]
+    data = pd.DataFrame({
+        "Latitude": [coordinates[row][0] for row in rows],
+        "Longitude": [coordinates[row][1] for row in rows],
+        LOCAL_INFRACAO: [f"Local {row}" for row in rows],
+        VALOR_A_PAGAR: pd.array([1000] * len(rows), dtype="Int64"),
+        DATA_INFRACAO: pd.Timestamp("2024-01-01"),
+    })
+    summary = LocationSummary(data)
+    click = {"last_object_clicked": {"lat": -22.90004, "lng": -43.2}}
+
+    location_ids = summary.find_clicked(click, 30)
+    clicked = summary.locations.iloc[location_ids]
+    assert sorted(zip(clicked["Latitude"], clicked["Longitude"])) == sorted(coordinates[:3])
+    assert (clicked["Latitude"].iloc[0], clicked["Longitude"].iloc[0]) == coordinates[1]
+    assert summary.fine_rows(location_ids).tolist() == [0, 1, 2, 3, 5, 6]
+
+    popup_id = location_ids[-1]
+    click["last_object_clicked_popup"] = f"1 multa(s) · local #{popup_id}"
+    assert summary.find_clicked(click, 30)[0] == popup_id
+    assert summary.find_clicked({"last_object_clicked": {"lat": 0, "lng": 0}}, 30) == []
+    assert summary.fine_rows([]).tolist() == []